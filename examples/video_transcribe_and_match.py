@@ -14,7 +14,7 @@ SKILLS_ROOT = os.path.dirname(JY_EDITOR_ROOT)
 WORKSPACE_ROOT = os.path.dirname(os.path.dirname(SKILLS_ROOT))
 CHAT_SCRIPT = os.path.join(SKILLS_ROOT, "antigravity-api-skill", "scripts", "chat.py")
 
-from jy_wrapper import JyProject, draft
+from jy_wrapper import JyProject
 
 
 def safe_decode(raw: bytes) -> str:
@@ -77,13 +77,15 @@ def collect_materials(material_inputs: List[str]) -> List[Dict]:
                     if name.lower().endswith((".mp4", ".mov")):
                         paths.append(os.path.join(root, name))
 
+    # Imported after jy_wrapper, whose setup_env() puts scripts/vendor on sys.path.
+    from core.material_pool import probe_many
+
     out: List[Dict] = []
-    for p in paths:
-        try:
-            dur = draft.VideoMaterial(p).duration / 1_000_000.0
-        except Exception:
-            dur = 0.0
-        out.append({"path": p, "filename": os.path.basename(p), "duration": max(0.1, dur)})
+    for res in probe_many(paths):
+        dur = res.material.duration / 1_000_000.0 if res.ok else 0.0
+        out.append(
+            {"path": res.path, "filename": os.path.basename(res.path), "duration": max(0.1, dur)}
+        )
     return out
 
 
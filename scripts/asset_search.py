@@ -1,11 +1,19 @@
 import argparse
-import csv
+import heapq
+import json
 import os
-from typing import Dict, List
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Tuple
 
+from utils.asset_catalog import get_asset_catalog
+from utils.asset_index import AssetIndex, iter_catalog_rows, load_asset_index, tokenize
 from utils.cli_protocol import emit_result, make_result
+from utils.config import CONFIG
 from utils.constants import SYNONYMS
-from utils.errors import InfraError
+from utils.daemon_client import try_daemon
+from utils.errors import InfraError, UserInputError
 from utils.logging_utils import setup_logger
 
 logger = setup_logger("asset_search")
@@ -39,65 +47,130 @@ def get_enum_key_from_ident(ident: str) -> str:
 
 
 def _iter_rows(filepath: str):
-    with open(filepath, "r", encoding="utf-8", newline="") as f:
-        lines = [line for line in f if not line.startswith("#")]
-    if not lines:
-        return
-    reader = csv.DictReader(lines)
-    for row in reader:
-        yield row
+    return iter_catalog_rows(filepath)
 
 
-def search_assets(query: str, category: str = None, limit: int = 20) -> List[Dict[str, str]]:
-    results: List[Dict[str, str]] = []
-    search_terms = expand_query_with_synonyms(query)
+RANKINGS = ("bm25", "legacy")
+BACKENDS = ("index", "sqlite")
+
+# 同义词扩展出的词在 BM25 中按此权重计分，原始查询词权重为 1
+SYNONYM_WEIGHT = 0.5
 
-    if not os.path.exists(DATA_DIR):
-        raise InfraError(f"Data directory not found: {DATA_DIR}")
 
-    files_to_search: List[str]
+def _files_to_search(category: str = None) -> List[str]:
     if category:
         normalized = category if category.endswith(".csv") else f"{category}.csv"
         if os.path.exists(os.path.join(DATA_DIR, normalized)):
-            files_to_search = [normalized]
-        else:
-            # 支持前缀匹配，如 -c filter => filters.csv
-            all_csv = [f for f in os.listdir(DATA_DIR) if f.endswith(".csv")]
-            files_to_search = [f for f in all_csv if f.startswith(category)]
-    else:
-        files_to_search = [f for f in os.listdir(DATA_DIR) if f.endswith(".csv")]
+            return [normalized]
+        # 支持前缀匹配，如 -c filter => filters.csv
+        all_csv = [f for f in os.listdir(DATA_DIR) if f.endswith(".csv")]
+        return [f for f in all_csv if f.startswith(category)]
+    return [f for f in os.listdir(DATA_DIR) if f.endswith(".csv")]
+
+
+def _rank_legacy(
+    index: AssetIndex, query: str, terms: List[str], file_order: Dict[str, int], limit: int
+) -> List[Tuple[float, int, int]]:
+    """整串命中 +100、每个扩展词命中 +10；倒排索引只给出候选行。"""
+    full_query = query.lower()
+    candidates = set(index.candidates(full_query))
+    for term in terms:
+        candidates.update(index.candidates(term))
 
-    for filename in files_to_search:
-        filepath = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(filepath):
-            logger.warning("Category file not found: %s", filename)
+    scored = []
+    for row_id in candidates:
+        pos = file_order.get(index.sources[row_id])
+        if pos is None:
             continue
+        blob = index.blobs[row_id]
+        score = 100 if full_query in blob else 0
+        for term in terms:
+            if term in blob:
+                score += 10
+        if score > 0:
+            scored.append((-score, pos, row_id))
+    return heapq.nsmallest(limit, scored)
+
+
+def _rank_bm25(
+    index: AssetIndex, query: str, terms: List[str], file_order: Dict[str, int], limit: int
+) -> List[Tuple[float, int, int]]:
+    """BM25F over identifier / description / category tokens (CJK bigrams, Latin words)."""
+    weighted: Dict[str, float] = {token: 1.0 for token in tokenize(query)}
+    for term in terms:
+        for token in tokenize(term):
+            weighted.setdefault(token, SYNONYM_WEIGHT)
+
+    scored = []
+    for row_id, score in index.bm25_scores(weighted).items():
+        pos = file_order.get(index.sources[row_id])
+        if pos is not None:
+            scored.append((-round(score, 4), pos, row_id))
+    return heapq.nsmallest(limit, scored)
+
+
+def _search_catalog(
+    query: str, terms: List[str], files: List[str], limit: int, ranking: str
+) -> List[Dict[str, str]]:
+    """SQLite 后端：FTS5 bm25() 排序，无命中或 legacy 时在 SQL 中按旧规则计分。"""
+    catalog = get_asset_catalog(DATA_DIR)
+    matches = []
+    if ranking == "bm25":
+        tokens = tokenize(query)
+        for term in terms:
+            tokens.extend(tokenize(term))
+        matches = catalog.search_fts(tokens, files, limit)
+    if not matches:
+        matches = catalog.search_substring(query, terms, files, limit)
+    return [dict(row, score=score, source_file=source) for score, source, row in matches]
+
+
+def search_assets(
+    query: str,
+    category: str = None,
+    limit: int = 20,
+    ranking: str = "bm25",
+    backend: str = None,
+) -> List[Dict[str, str]]:
+    """
+    在 data/*.csv 中搜索资产，返回得分最高的 `limit` 行（附带 score / source_file）。
+
+    ranking="bm25"（默认）按 BM25F 相关度排序，无任何词项命中时回退到子串匹配；
+    ranking="legacy" 保持旧的子串计分（整串 +100、每个扩展词 +10）。
+    同分按文件顺序和行顺序排列，只用容量为 limit 的堆选出前 k 个结果。
+    backend 为 "index"（内存倒排索引）或 "sqlite"（utils.asset_catalog 的 FTS5 数据库），
+    默认取 JY_ASSET_BACKEND。
+    """
+    if ranking not in RANKINGS:
+        raise UserInputError(f"Unknown ranking: {ranking} (expected one of {', '.join(RANKINGS)})")
+    backend = backend or CONFIG.asset_backend
+    if backend not in BACKENDS:
+        raise UserInputError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    search_terms = expand_query_with_synonyms(query)
+
+    if not os.path.exists(DATA_DIR):
+        raise InfraError(f"Data directory not found: {DATA_DIR}")
+
+    files = _files_to_search(category)
+    limit = max(1, limit)
+    if backend == "sqlite":
+        return _search_catalog(query, search_terms, files, limit, ranking)
 
-        for row in _iter_rows(filepath):
-            target_text = " ".join(
-                [
-                    row.get("identifier", ""),
-                    row.get("description", ""),
-                    row.get("category", ""),
-                    row.get("title", ""),
-                    row.get("name", ""),
-                ]
-            ).lower()
-
-            score = 0
-            if query.lower() in target_text:
-                score += 100
-            for term in search_terms:
-                if term in target_text:
-                    score += 10
-
-            if score > 0:
-                row["score"] = score
-                row["source_file"] = filename
-                results.append(row)
-
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[: max(1, limit)]
+    index = load_asset_index(DATA_DIR)
+    file_order = {name: pos for pos, name in enumerate(files)}
+    top = []
+    if ranking == "bm25":
+        top = _rank_bm25(index, query, search_terms, file_order, limit)
+    if not top:
+        top = _rank_legacy(index, query, search_terms, file_order, limit)
+
+    results: List[Dict[str, str]] = []
+    for neg_score, _, row_id in top:
+        row = dict(index.rows[row_id])
+        row["score"] = -neg_score
+        row["source_file"] = index.sources[row_id]
+        results.append(row)
+    return results
 
 
 def format_results(results: List[Dict[str, str]]) -> str:
@@ -108,7 +181,8 @@ def format_results(results: List[Dict[str, str]]) -> str:
     output = [header, "-" * len(header)]
 
     for r in results:
-        ident = r.get("identifier") or r.get("title") or r.get("name") or "N/A"
+        ident = r.get("identifier") or r.get("title") or r.get("name") or r.get("speaker_id")
+        ident = ident or "N/A"
         display_ident = ident if len(ident) <= 23 else ident[:20] + "..."
         cat = (r.get("category") or r.get("categories") or "N/A")[:15]
         src = r.get("source_file", "").replace(".csv", "")
@@ -139,6 +213,180 @@ def _list_categories() -> int:
     return 0
 
 
+def _parse_batch_line(line: str) -> Dict:
+    try:
+        spec = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise UserInputError(f"invalid JSON: {e}") from e
+    if isinstance(spec, str):
+        spec = {"query": spec}
+    if not isinstance(spec, dict) or not isinstance(spec.get("query"), str):
+        raise UserInputError('each line needs a "query" string')
+    limit = spec.get("limit", 20)
+    if not isinstance(limit, int) or isinstance(limit, bool):
+        raise UserInputError('"limit" must be an integer')
+    for key in ("category", "ranking"):
+        if spec.get(key) is not None and not isinstance(spec[key], str):
+            raise UserInputError(f'"{key}" must be a string')
+    req_id = spec.get("id")
+    if req_id is not None and (isinstance(req_id, bool) or not isinstance(req_id, (str, int))):
+        raise UserInputError('"id" must be a string or an integer')
+    return spec
+
+
+def _run_batch_query(spec: Dict, backend: str) -> Dict:
+    ranking = spec.get("ranking") or "bm25"
+    start = time.perf_counter()
+    try:
+        results = search_assets(
+            spec["query"], spec.get("category"), spec.get("limit", 20), ranking, backend
+        )
+    except UserInputError as e:
+        return make_result(False, "invalid_input", str(e), {"id": spec.get("id")})
+    except InfraError as e:
+        return make_result(False, "infra_error", str(e), {"id": spec.get("id")})
+    except Exception as e:
+        # 单条查询的意外错误只影响该行，不中断整个批次
+        logger.exception("Batch query %r failed", spec.get("query"))
+        return make_result(False, "internal_error", str(e), {"id": spec.get("id")})
+    return make_result(
+        True,
+        "ok",
+        "",
+        {
+            "id": spec.get("id"),
+            "query": spec["query"],
+            "category": spec.get("category"),
+            "ranking": ranking,
+            "count": len(results),
+            "results": results,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        },
+    )
+
+
+def run_batch(lines: Iterable[str], backend: str = None, workers: int = None) -> Iterator[Dict]:
+    """
+    批量查询：每行一个 JSON 对象 {"query", "category", "limit", "ranking", "id"}（也可以是纯字符串）。
+
+    所有查询共用同一份已加载的索引 / 目录数据库，结果按输入顺序逐条产出 make_result 信封，
+    data 中带 elapsed_ms。查询按分类分组并行执行：sqlite 后端默认每组一个线程（最多 4 个），
+    内存索引的查询受 GIL 限制且只需约 0.1ms，默认串行。
+    """
+    backend = backend or CONFIG.asset_backend
+    specs: List[Tuple[int, Dict]] = []
+    errors: Dict[int, Dict] = {}
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        pos = len(specs) + len(errors)
+        try:
+            specs.append((pos, _parse_batch_line(line)))
+        except UserInputError as e:
+            errors[pos] = make_result(
+                False, "invalid_input", f"line {line_no}: {e}", {"line": line_no}
+            )
+
+    # 先加载一次索引 / 同步一次目录，之后的查询都命中内存或数据库
+    if os.path.exists(DATA_DIR) and backend in BACKENDS:
+        if backend == "sqlite":
+            get_asset_catalog(DATA_DIR).sync()
+        else:
+            load_asset_index(DATA_DIR)
+
+    groups: Dict[str, List[Tuple[int, Dict]]] = {}
+    for pos, spec in specs:
+        groups.setdefault(str(spec.get("category") or ""), []).append((pos, spec))
+
+    def run_group(group: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+        return [(pos, _run_batch_query(spec, backend)) for pos, spec in group]
+
+    if workers is None:
+        workers = min(4, len(groups)) if backend == "sqlite" else 1
+    done: Dict[int, Dict] = dict(errors)
+    next_pos = 0
+    total = len(specs) + len(errors)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run_group, group) for group in groups.values()]
+        for future in as_completed(futures):
+            done.update(future.result())
+            while next_pos in done:
+                yield done.pop(next_pos)
+                next_pos += 1
+    while next_pos < total:
+        yield done.pop(next_pos)
+        next_pos += 1
+
+
+def _batch(source: str, backend: str = None, workers: int = None) -> int:
+    try:
+        if source == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+    except OSError as e:
+        emit_result(make_result(False, "infra_error", str(e)), True)
+        return 1
+
+    start = time.perf_counter()
+    count = failed = 0
+    served, results = try_daemon("batch", lines=lines, backend=backend, workers=workers)
+    for result in results if served else run_batch(lines, backend, workers):
+        emit_result(result, True)
+        count += 1
+        failed += not result["ok"]
+    logger.info(
+        "Batch: %d queries (%d failed) in %.1fms",
+        count,
+        failed,
+        (time.perf_counter() - start) * 1000,
+    )
+    return 2 if failed else 0
+
+
+def _build_index(as_json: bool, backend: str = None) -> int:
+    if not os.path.exists(DATA_DIR):
+        emit_result(
+            make_result(False, "infra_error", f"Data directory not found: {DATA_DIR}"), as_json
+        )
+        return 1
+    start = time.perf_counter()
+    if (backend or CONFIG.asset_backend) == "sqlite":
+        # 增量编译：只重建内容哈希变化的 CSV
+        try:
+            catalog = get_asset_catalog(DATA_DIR)
+            report = catalog.sync()
+        except InfraError as e:
+            emit_result(make_result(False, "infra_error", str(e)), as_json)
+            return 1
+        stats = catalog.stats()
+        data = {
+            "backend": "sqlite",
+            "db_path": stats["db_path"],
+            "rows": stats["rows"],
+            "files": report,
+            "build_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        built = sum(1 for status in report.values() if status == "built")
+        summary = f"✅ Catalog: {data['rows']} rows, {built}/{len(report)} CSV files rebuilt"
+    else:
+        index = load_asset_index(DATA_DIR, rebuild=True)
+        data = {
+            "backend": "index",
+            "rows": len(index),
+            "files": len(index.signature),
+            "grams": len(index.postings),
+            "build_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        summary = f"✅ Indexed {data['rows']} rows from {data['files']} CSV files"
+    if as_json:
+        emit_result(make_result(True, "ok", "", data), True)
+    else:
+        print(f"{summary} in {data['build_ms']}ms")
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="剪映资产搜索工具 (智能双语版)")
     parser.add_argument("query", nargs="?", default=None, help="搜索关键词")
@@ -146,18 +394,52 @@ def main() -> int:
     parser.add_argument("-l", "--limit", type=int, default=20, help="数量限制")
     parser.add_argument("--list", action="store_true", help="列出分类")
     parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    parser.add_argument("--ranking", choices=RANKINGS, default="bm25", help="排序方式（默认 bm25）")
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default=None, help="检索后端（默认 JY_ASSET_BACKEND）"
+    )
+    parser.add_argument(
+        "--build-index", action="store_true", help="重建倒排索引 / 增量编译 SQLite 目录"
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="批量模式：从 FILE（省略则为 stdin）读取 JSONL 查询，逐行输出 JSONL 结果",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="批量模式的并行线程数")
     args = parser.parse_args()
+    # 在调用方解析后端，使常驻进程按本进程的 JY_ASSET_BACKEND 而非它自己的环境执行
+    backend = args.backend or CONFIG.asset_backend
 
     if args.list:
         return _list_categories()
 
+    if args.build_index:
+        return _build_index(args.json, backend)
+
+    if args.batch:
+        return _batch(args.batch, backend, args.workers)
+
     if not args.query:
         parser.print_help()
         return 0
 
     logger.info("Searching '%s'...", args.query)
     try:
-        search_results = search_assets(args.query, args.category, args.limit)
+        served, search_results = try_daemon(
+            "search",
+            query=args.query,
+            category=args.category,
+            limit=args.limit,
+            ranking=args.ranking,
+            backend=backend,
+        )
+        if not served:
+            search_results = search_assets(
+                args.query, args.category, args.limit, args.ranking, backend
+            )
         if args.json:
             emit_result(
                 make_result(
@@ -167,6 +449,8 @@ def main() -> int:
                     {
                         "query": args.query,
                         "category": args.category,
+                        "ranking": args.ranking,
+                        "backend": backend,
                         "count": len(search_results),
                         "results": search_results,
                     },
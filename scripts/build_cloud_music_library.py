@@ -4,6 +4,7 @@ import json
 import os
 from typing import Dict
 
+from utils.asset_index import iter_catalog_rows
 from utils.cli_protocol import emit_result, make_result
 from utils.config import CONFIG
 from utils.errors import InfraError
@@ -28,12 +29,7 @@ def load_existing_csv(path: str, id_key: str) -> Dict[str, dict]:
     if not os.path.exists(path):
         return library
     try:
-        with open(path, "r", encoding="utf-8", newline="") as f:
-            lines = [line for line in f if not line.startswith("#")]
-        if not lines:
-            return library
-        reader = csv.DictReader(lines)
-        for row in reader:
+        for row in iter_catalog_rows(path):
             m_id = row.get(id_key, "")
             if not m_id:
                 continue
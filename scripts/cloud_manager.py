@@ -1,5 +1,4 @@
 import argparse
-import csv
 import ipaddress
 import os
 import re
@@ -7,7 +6,11 @@ from typing import Dict, Optional
 from urllib.parse import parse_qs, urlparse
 
 import requests
+from utils.asset_catalog import AssetCatalog, get_asset_catalog, parse_duration
+from utils.asset_index import iter_catalog_rows
 from utils.config import CONFIG
+from utils.daemon_client import try_daemon
+from utils.errors import InfraError
 from utils.logging_utils import setup_logger
 
 SKILL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,43 +21,56 @@ ALLOWED_SCHEMES = {"http", "https"}
 logger = setup_logger("cloud_manager")
 
 
+CLOUD_DB_FILES = ("cloud_music_library.csv", "cloud_video_assets.csv", "cloud_sound_effects.csv")
+
+
+def _asset_from_row(row: dict, db_name: str) -> Optional[dict]:
+    eid = row.get("id") or row.get("music_id") or row.get("effect_id")
+    if not eid:
+        return None
+    name = row.get("name") or row.get("title") or row.get("name_hint") or ""
+    return {
+        "id": str(eid),
+        "name": str(name),
+        "url": row.get("url", ""),
+        "duration_s": parse_duration(row.get("duration_s") or row.get("duration")),
+        "type": row.get("type") or row.get("categories", "unknown"),
+        "source_db": db_name,
+    }
+
+
 class CloudManager:
-    def __init__(self):
-        self.assets = self._load_database()
+    def __init__(self, catalog: Optional[AssetCatalog] = None, backend: Optional[str] = None):
+        # JY_ASSET_BACKEND=sqlite (or backend="sqlite"): look assets up in the SQLite catalog
+        # instead of loading the CSVs
+        self.catalog = catalog if catalog is not None else self._open_catalog(backend)
+        self.assets = self._load_database() if self.catalog is None else {}
         if not os.path.exists(CACHE_DIR):
             os.makedirs(CACHE_DIR)
 
+    @staticmethod
+    def _open_catalog(backend: Optional[str] = None) -> Optional[AssetCatalog]:
+        if (backend or CONFIG.asset_backend) != "sqlite":
+            return None
+        try:
+            return get_asset_catalog(os.path.join(SKILL_ROOT, "data"))
+        except InfraError as e:
+            logger.warning("%s; falling back to CSV lookup.", e)
+            return None
+
     def _load_database(self) -> Dict[str, dict]:
         assets: Dict[str, dict] = {}
-        db_files = ["cloud_music_library.csv", "cloud_video_assets.csv", "cloud_sound_effects.csv"]
 
-        for db_name in db_files:
+        for db_name in CLOUD_DB_FILES:
             path = os.path.join(SKILL_ROOT, "data", db_name)
             if not os.path.exists(path):
                 continue
 
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    lines = [line for line in f.readlines() if not line.startswith("#")]
-                    reader = csv.DictReader(lines)
-                    for row in reader:
-                        eid = row.get("id") or row.get("music_id") or row.get("effect_id")
-                        if not eid:
-                            continue
-                        name = row.get("name") or row.get("title") or row.get("name_hint") or ""
-                        dur = row.get("duration_s") or row.get("duration")
-                        assets[str(eid)] = {
-                            "id": str(eid),
-                            "name": str(name),
-                            "url": row.get("url", ""),
-                            "duration_s": (
-                                float(dur)
-                                if dur and str(dur).replace(".", "", 1).isdigit()
-                                else None
-                            ),
-                            "type": row.get("type") or row.get("categories", "unknown"),
-                            "source_db": db_name,
-                        }
+                for row in iter_catalog_rows(path):
+                    asset = _asset_from_row(row, db_name)
+                    if asset:
+                        assets[asset["id"]] = asset
             except Exception as e:
                 logger.warning("Error loading %s: %s", db_name, e)
 
@@ -62,11 +78,22 @@ class CloudManager:
             logger.info("Cloud Manager indexed %d items.", len(assets))
         return assets
 
+    def _find_in_catalog(self, query: str) -> Optional[dict]:
+        found = self.catalog.find_by_id(str(query), CLOUD_DB_FILES)
+        if found:
+            asset = _asset_from_row(found[1], found[0])
+            return asset if asset and asset.get("url") else None
+        found = self.catalog.find_by_name(str(query), CLOUD_DB_FILES, require_url=True)
+        return _asset_from_row(found[1], found[0]) if found else None
+
     def find_asset(self, query: str) -> Optional[dict]:
         """
         Find by ID or fuzzy name.
         Important rule: rows without URL are treated as unavailable and not returned.
         """
+        if self.catalog is not None:
+            return self._find_in_catalog(query)
+
         if query in self.assets:
             asset = self.assets[query]
             return asset if asset.get("url") else None
@@ -266,7 +293,9 @@ if __name__ == "__main__":
     parser.add_argument("--force", action="store_true", help="Force redownload")
     args = parser.parse_args()
 
-    manager = CloudManager()
-    path = manager.download_asset(args.query, args.force)
+    backend = CONFIG.asset_backend
+    served, path = try_daemon("download_asset", query=args.query, force=args.force, backend=backend)
+    if not served:
+        path = CloudManager(backend=backend).download_asset(args.query, args.force)
     if path:
         print(f"RESULT_PATH|{path}")
@@ -0,0 +1,207 @@
+import enum
+import functools
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pyJianYingDraft as draft
+
+JOURNAL_VERSION = 1
+
+# Value objects that may appear in journaled call arguments (e.g. add_text_simple style=...).
+_VALUE_CLASSES = {
+    cls.__name__: cls
+    for cls in (
+        draft.ClipSettings,
+        draft.CropSettings,
+        draft.TextStyle,
+        draft.TextBorder,
+        draft.TextBackground,
+        draft.TextShadow,
+    )
+}
+
+
+class OperationJournal:
+    """
+    Append-only JSONL log of JyProject operations.
+
+    Each successful top-level operation is written as one line and flushed immediately, so an
+    interrupted build can be rebuilt with `JyProject.replay_journal()` instead of re-running
+    TTS, downloads and probes. Files generated inside the draft folder (e.g. TTS clips in
+    temp_assets) are copied next to the journal, because recreating a draft wipes that folder.
+    """
+
+    def __init__(self, path: str, volatile_dir: Optional[str] = None, fsync: bool = False):
+        self.path = os.path.abspath(path)
+        self.assets_dir = os.path.splitext(self.path)[0] + "_assets"
+        self.volatile_dir = os.path.abspath(volatile_dir) if volatile_dir else None
+        self.fsync = fsync
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def reset(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if os.path.isdir(self.assets_dir):
+            shutil.rmtree(self.assets_dir, ignore_errors=True)
+
+    def record(self, op: str, args: tuple, kwargs: Dict[str, Any]) -> bool:
+        """Append one operation; returns False if its arguments cannot be encoded."""
+        try:
+            entry = {
+                "v": JOURNAL_VERSION,
+                "ts": round(time.time(), 3),
+                "op": op,
+                "args": [self._encode(a) for a in args],
+                "kwargs": {k: self._encode(v) for k, v in kwargs.items()},
+            }
+            line = json.dumps(entry, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Journal skipped '{op}': {e}")
+            return False
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return True
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Yield decoded entries; a torn trailing line from a crash is skipped."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️ Journal line {lineno} is incomplete, skipped.")
+                    continue
+                if entry.get("v") != JOURNAL_VERSION:
+                    print(f"⚠️ Journal line {lineno} has unsupported version, skipped.")
+                    continue
+                entry["args"] = [self._decode(a) for a in entry.get("args", [])]
+                entry["kwargs"] = {k: self._decode(v) for k, v in entry.get("kwargs", {}).items()}
+                yield entry
+
+    def _preserve(self, path: str) -> str:
+        # Files living inside the draft folder are removed when the draft is recreated.
+        abs_path = os.path.abspath(path)
+        if not self.volatile_dir or not abs_path.startswith(self.volatile_dir + os.sep):
+            return path
+        os.makedirs(self.assets_dir, exist_ok=True)
+        kept = os.path.join(self.assets_dir, os.path.basename(abs_path))
+        if not os.path.exists(kept):
+            shutil.copy2(abs_path, kept)
+        return kept
+
+    def _encode(self, value: Any) -> Any:
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, str):
+            return self._preserve(value) if os.path.isfile(value) else value
+        if isinstance(value, (list, tuple)):
+            return [self._encode(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self._encode(v) for k, v in value.items()}
+        if isinstance(value, enum.Enum):
+            return {"__enum__": type(value).__name__, "name": value.name}
+        cls_name = type(value).__name__
+        if cls_name in _VALUE_CLASSES:
+            return {"__obj__": cls_name, "attrs": self._encode(vars(value))}
+        raise TypeError(f"unsupported argument type {cls_name}")
+
+    def _decode(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self._decode(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if "__enum__" in value:
+            return getattr(draft, value["__enum__"])[value["name"]]
+        if "__obj__" in value:
+            obj = object.__new__(_VALUE_CLASSES[value["__obj__"]])
+            obj.__dict__.update(self._decode(value["attrs"]))
+            return obj
+        return {k: self._decode(v) for k, v in value.items()}
+
+
+def journaled(fn: Callable) -> Callable:
+    """
+    Record a JyProject method in the active journal.
+
+    Only the outermost journaled call is recorded (nested calls are replayed by it), and only
+    when it returned a result; failed operations return None and are not journaled.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        journal = getattr(self, "_journal", None)
+        if journal is None or self._journal_depth > 0:
+            return fn(self, *args, **kwargs)
+
+        self._journal_depth += 1
+        try:
+            result = fn(self, *args, **kwargs)
+        finally:
+            self._journal_depth -= 1
+        if result is not None:
+            journal.record(fn.__name__, args, kwargs)
+        return result
+
+    wrapper._journaled = True
+    return wrapper
+
+
+class JournalMixin:
+    """
+    JyProject 的操作日志 Mixin：记录顶层操作，崩溃后可快速重放。
+    """
+
+    def enable_journal(self, path: str = None, reset: bool = False, fsync: bool = False):
+        """
+        开启操作日志。默认写入 <drafts_root>/.jy_journal/<project>.jsonl（草稿目录外，重建草稿不会删除）。
+        reset=True 时清空已有日志，用于全新构建。
+        """
+        path = path or self._default_journal_path()
+        self._journal = OperationJournal(path, volatile_dir=self.draft_dir, fsync=fsync)
+        if reset:
+            self._journal.reset()
+        return self._journal.path
+
+    def _default_journal_path(self) -> str:
+        return os.path.join(self.root, ".jy_journal", f"{self.name}.jsonl")
+
+    def disable_journal(self):
+        self._journal = None
+
+    def replay_journal(self, path: str = None) -> int:
+        """按顺序重放日志中的操作（重放期间不再写日志），返回成功重放的操作数。"""
+        if path:
+            journal = OperationJournal(path, volatile_dir=self.draft_dir)
+        else:
+            journal = self._journal or OperationJournal(self._default_journal_path())
+        replayed = 0
+        failed: List[str] = []
+        self._journal_depth += 1
+        try:
+            for entry in journal.entries():
+                method = getattr(self, entry["op"], None)
+                # 只允许重放被 @journaled 标记的操作
+                if method is None or not getattr(method, "_journaled", False):
+                    failed.append(entry["op"])
+                    continue
+                if method(*entry["args"], **entry["kwargs"]) is None:
+                    failed.append(entry["op"])
+                else:
+                    replayed += 1
+        finally:
+            self._journal_depth -= 1
+        if failed:
+            print(f"⚠️ Journal replay: {len(failed)} operation(s) failed: {', '.join(failed)}")
+        return replayed
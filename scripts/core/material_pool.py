@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pyJianYingDraft as draft
+
+PoolKey = Tuple[str, str, int, int]
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".aac", ".flac", ".m4a", ".ogg")
+VISUAL_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".m4v", ".webm")
+VISUAL_EXTENSIONS += (".gif", ".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def material_kind(path: str) -> str:
+    """Material kind by extension: audio files are "audio", video and image files "video"."""
+    return "audio" if os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS else "video"
+
+
+def list_media_files(
+    folder: str, recursive: bool = False, extensions: Iterable[str] = None
+) -> List[str]:
+    """Sorted absolute paths of media files in `folder` (optionally including subfolders)."""
+    exts = tuple(e.lower() for e in (extensions or AUDIO_EXTENSIONS + VISUAL_EXTENSIONS))
+    folder = os.path.abspath(folder)
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(exts))
+        if not recursive:
+            break
+    return sorted(paths)
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of probing one file: `material` on success, `error` (message) otherwise."""
+
+    path: str
+    material: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _probe_one(path: str) -> ProbeResult:
+    factory = draft.AudioMaterial if material_kind(path) == "audio" else draft.VideoMaterial
+    try:
+        return ProbeResult(path, factory(path))
+    except Exception as e:
+        return ProbeResult(path, error=f"{type(e).__name__}: {e}")
+
+
+def probe_many(paths: Sequence[str], workers: int = 8) -> List[ProbeResult]:
+    """
+    Probe media files concurrently and return one ProbeResult per path, in input order.
+
+    Probing is dominated by MediaInfo / ffprobe I/O, which releases the GIL, so a thread pool
+    is used. Failures are reported per file instead of raised. Every successful probe also
+    lands in the persistent probe cache (utils.probe_cache) when it is installed.
+    """
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        return [_probe_one(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(_probe_one, paths))
+
+
+class MaterialPool:
+    """
+    Per-project cache of probed media materials.
+
+    `draft.VideoMaterial` / `draft.AudioMaterial` run a full MediaInfo parse on construction.
+    The pool keys each material by (kind, absolute path, size, mtime_ns), so repeated clips of
+    the same unchanged file reuse the first probe; editing or replacing the file changes the
+    key and triggers a fresh probe. Materials are shared objects (see `ScriptMaterial.intern`),
+    so every segment cut from a pooled material links to the same draft material entry.
+    """
+
+    def __init__(self):
+        self._items: Dict[PoolKey, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(kind: str, path: str) -> Optional[PoolKey]:
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return kind, path, st.st_size, st.st_mtime_ns
+
+    def peek(self, kind: str, path: str) -> Any:
+        """Pooled material of `kind` for `path` or None, without touching the counters."""
+        key = self._key(kind, path)
+        return self._items.get(key) if key is not None else None
+
+    def put(self, kind: str, path: str, material: Any) -> None:
+        """Add a material probed elsewhere (e.g. by `probe_many`); counts as a miss."""
+        self.misses += 1
+        key = self._key(kind, path)
+        if key is not None:
+            self._items[key] = material
+
+    def get(self, kind: str, path: str, factory: Callable[[str], Any]) -> Any:
+        """
+        Return the pooled material of `kind` for `path`, calling `factory(path)` on a miss.
+        Exceptions from `factory` propagate and nothing is cached.
+        """
+        key = self._key(kind, path)
+        material = self._items.get(key) if key is not None else None
+        if material is not None:
+            self.hits += 1
+            return material
+
+        self.misses += 1
+        material = factory(path)
+        if key is not None:
+            self._items[key] = material
+        return material
+
+    def move(self, kind: str, old_path: str, new_path: str) -> None:
+        """Re-key the material pooled for `old_path` under `new_path` (e.g. after normalization)."""
+        old_key = self._key(kind, old_path)
+        material = self._items.pop(old_key, None) if old_key is not None else None
+        new_key = self._key(kind, new_path)
+        if material is not None and new_key is not None:
+            self._items.setdefault(new_key, material)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Probe savings of this build: pool hits (probes skipped), misses and pooled files."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
@@ -1,11 +1,27 @@
 import os
-from typing import Union
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
 import pyJianYingDraft as draft
+from core.journal import journaled
+from core.material_pool import (
+    AUDIO_EXTENSIONS,
+    ProbeResult,
+    list_media_files,
+    material_kind,
+    probe_many,
+)
 from pyJianYingDraft import trange
-from pyJianYingDraft.exceptions import SegmentOverlap
 from utils.formatters import get_duration_ffprobe_cached, safe_tim
-from utils.media_normalizer import normalize_webm_for_jianying
+from utils.media_normalizer import fresh_normalized_path, normalize_webm_for_jianying
+from utils.media_probe import MediaProbe, probe_media_file
+
+
+class _UnprobedDuration(Exception):
+    """素材有视频轨但时长解析失败，带回已构造的素材，避免其被放入素材池。"""
+
+    def __init__(self, material):
+        super().__init__(material.path)
+        self.material = material
 
 
 class MediaOpsMixin:
@@ -13,6 +29,7 @@ class MediaOpsMixin:
     JyProject 的媒体处理 Mixin。
     """
 
+    @journaled
     def add_media_safe(
         self,
         media_path: str,
@@ -29,20 +46,127 @@ class MediaOpsMixin:
         ext = os.path.splitext(media_path)[1].lower()
         # Normalize WEBM to a stable MP4 profile before import to avoid parser incompatibilities.
         if ext == ".webm":
-            normalized_path = normalize_webm_for_jianying(media_path)
+            normalized_path = fresh_normalized_path(media_path)
+            if normalized_path is None:
+                # 转码放到后台：先用 ffprobe 的时长/尺寸占位，save() 时换成 MP4 路径
+                probe = probe_media_file(media_path)
+                if probe is not None and probe.has_video and probe.duration > 0:
+                    return self._add_webm_deferred(
+                        media_path, probe, start_time, duration, track_name, source_start
+                    )
+                normalized_path = normalize_webm_for_jianying(media_path)
             if not normalized_path:
                 print(f"❌ WEBM normalization failed: {media_path}")
                 return None
             media_path = normalized_path
             ext = ".mp4"
 
-        if ext in [".mp3", ".wav", ".aac", ".flac", ".m4a", ".ogg"]:
+        if ext in AUDIO_EXTENSIONS:
             return self.add_audio_safe(media_path, start_time, duration, track_name or "AudioTrack")
 
         return self._add_video_safe(
             media_path, start_time, duration, track_name or "VideoTrack", source_start=source_start
         )
 
+    def _add_webm_deferred(
+        self,
+        media_path: str,
+        probe: MediaProbe,
+        start_time: Union[str, int],
+        duration: Union[str, int],
+        track_name: Optional[str],
+        source_start: Union[str, int],
+    ):
+        job = self._normalization_pool.submit(media_path)
+        seg = self._add_video_safe(
+            media_path,
+            start_time,
+            duration,
+            track_name or "VideoTrack",
+            source_start=source_start,
+            probe=probe,
+        )
+        if seg is not None:
+            # 同一 WEBM 再次添加时复用同一共享素材，只登记一次；源路径在提交时记录
+            material = seg.material_instance
+            self._pending_normalizations.setdefault(
+                material.material_id, (material, os.path.abspath(media_path), job)
+            )
+        return seg
+
+    def wait_normalizations(self) -> Dict[str, Optional[str]]:
+        """
+        等待后台 WEBM 转码完成，并把对应素材的路径换成转码后的 MP4（save() 会自动调用）。
+        返回 {WEBM 源路径: MP4 路径}；转码失败或超时时为 None，素材保留源路径。
+        """
+        pending, self._pending_normalizations = self._pending_normalizations, {}
+        results: Dict[str, Optional[str]] = {}
+        for material, src, job in pending.values():
+            try:
+                dst = job.result()
+            except Exception as e:
+                print(f"❌ WEBM normalization failed: {e}")
+                dst = None
+            if dst:
+                old_path = material.path
+                material.path = dst
+                material.material_name = os.path.basename(dst)
+                # 之后再添加该 WEBM（命中转码缓存，走 MP4 路径）时仍复用同一素材
+                self._material_pool.move("video", src, dst)
+                self.script.materials.rekey(material, old_path)
+            else:
+                print(f"⚠️ WEBM normalization failed, keeping source path: {src}")
+            results[src] = dst
+        return results
+
+    def probe_many(self, paths: Sequence[str], workers: int = 8) -> List[ProbeResult]:
+        """
+        并行探测一批素材并放入素材池，之后 add_media_safe / add_clip 同一文件时直接复用。
+        结果与输入顺序一致；单个文件失败时记录在 ProbeResult.error 中，不抛异常。
+        """
+        results: List[ProbeResult] = [None] * len(paths)
+        pending = []
+        for i, path in enumerate(paths):
+            material = self._material_pool.peek(material_kind(path), path)
+            if material is not None:
+                results[i] = ProbeResult(path, material)
+            else:
+                pending.append(i)
+
+        probed = probe_many([paths[i] for i in pending], workers=workers)
+        for i, result in zip(pending, probed):
+            if result.ok and getattr(result.material, "duration_probed", True):
+                self._material_pool.put(material_kind(result.path), result.path, result.material)
+            results[i] = result
+        return results
+
+    def add_media_folder(
+        self,
+        folder: str,
+        start_time: Union[str, int] = None,
+        clip_duration: Union[str, int] = None,
+        track_name: str = None,
+        recursive: bool = False,
+        extensions: Iterable[str] = None,
+        workers: int = 8,
+    ) -> list:
+        """
+        按文件名顺序把文件夹中的素材依次追加到轨道（音频进音频轨，视频/图片进视频轨）。
+        素材先由 probe_many 并行探测，无法解析的文件跳过并打印原因。返回添加的片段列表。
+        """
+        paths = list_media_files(folder, recursive=recursive, extensions=extensions)
+        segments = []
+        for result in self.probe_many(paths, workers=workers):
+            if not result.ok:
+                print(f"⚠️ Skipped {os.path.basename(result.path)}: {result.error}")
+                continue
+            seg = self.add_media_safe(result.path, start_time, clip_duration, track_name)
+            start_time = None  # 之后的素材接在轨道末尾
+            if seg is not None:
+                segments.append(seg)
+        return segments
+
+    @journaled
     def add_audio_safe(
         self,
         media_path: str,
@@ -56,7 +180,7 @@ class MediaOpsMixin:
         self._ensure_track(draft.TrackType.audio, track_name)
 
         try:
-            mat = draft.AudioMaterial(media_path)
+            mat = self._material_pool.get("audio", media_path, draft.AudioMaterial)
             phys_duration = mat.duration
         except Exception:
             return None
@@ -78,6 +202,7 @@ class MediaOpsMixin:
         duration: Union[str, int] = None,
         track_name: str = "VideoTrack",
         source_start: Union[str, int] = 0,
+        probe: MediaProbe = None,
         **kwargs,
     ):
         if start_time is None:
@@ -86,7 +211,34 @@ class MediaOpsMixin:
 
         try:
             fallback_duration_us = safe_tim(duration) * 10 if duration else None
-            mat = draft.VideoMaterial(media_path, duration=fallback_duration_us)
+            if probe is not None:
+                fallback_duration_us = int(probe.duration * 1000000)
+            # 同一文件(路径/大小/mtime 不变)只探测一次。调用方 duration 推出的兜底时长不进素材池，
+            # 否则首个调用方的兜底会固定给之后每次添加；ffprobe 时长与调用方无关，可以入池
+            pooled_fallback = fallback_duration_us if probe is not None else None
+
+            def factory(path):
+                material = draft.VideoMaterial(path, duration=pooled_fallback)
+                if probe is None and not material.duration_probed:
+                    raise _UnprobedDuration(material)
+                return material
+
+            try:
+                mat = self._material_pool.get("video", media_path, factory)
+            except _UnprobedDuration as e:
+                # 有视频轨但解析不出时长(WebM/MKV 常见)：不入池，用本次调用的兜底时长
+                mat = e.material
+                if fallback_duration_us is not None:
+                    mat.duration = fallback_duration_us
+            except Exception:
+                if fallback_duration_us is None:
+                    raise
+                # 探测失败：按本次调用的兜底时长构造素材，不放入素材池
+                mat = draft.VideoMaterial(media_path, duration=fallback_duration_us)
+            if probe is not None:
+                # 待转码的 WEBM：以 ffprobe 结果为准（MediaInfo 对 WEBM 常缺时长）
+                mat.duration = fallback_duration_us
+                mat.width, mat.height = probe.display_size
             phys_duration = mat.duration
         except Exception:
             return None
@@ -114,6 +266,7 @@ class MediaOpsMixin:
         self.script.add_segment(seg, track_name)
         return seg
 
+    @journaled
     def add_cloud_media(
         self,
         query: str,
@@ -147,6 +300,7 @@ class MediaOpsMixin:
             )
         return self.add_media_safe(local_path, start_time, duration, track_name or "VideoTrack")
 
+    @journaled
     def add_cloud_music(
         self,
         query: str,
@@ -223,13 +377,8 @@ class MediaOpsMixin:
         track = self.script.tracks.get(track_name)
         if track is None:
             return False
-        try:
-            for existing in track.segments:
-                if existing.overlaps(segment):
-                    return False
-            return True
-        except SegmentOverlap:
-            return False
+        # 轨道片段按起始时间有序，二分定位后只需检查相邻片段
+        return track.find_overlap(segment) is None
 
     def _ensure_track(self, track_type, track_name):
         """确保轨道存在，不存在则创建。"""
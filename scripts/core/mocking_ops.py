@@ -1,7 +1,9 @@
-import os
-import json
 import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 import pyJianYingDraft as draft
+from core.save_pipeline import extend_items, iter_segments, map_items, map_segments
+from pyJianYingDraft.json_stream import LazyArray
 
 class MockVideoMaterial(draft.VideoMaterial):
     def __init__(self, material_id, duration, name, path):
@@ -42,72 +44,120 @@ class MockingOpsMixin:
     """
     JyProject 的协议补丁与伪物料 Mixin。
     """
-    def _force_activate_adjustments(self):
-        content_path = os.path.join(self.root, self.name, "draft_content.json")
-        if not os.path.exists(content_path): return
-
-        try:
-            with open(content_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            has_modified = False
-            materials = data.setdefault("materials", {})
-            all_effects = materials.setdefault("effects", [])
-
-            PROP_MAP = {"KFTypeBrightness": "brightness", "KFTypeContrast": "contrast", "KFTypeSaturation": "saturation"}
-            jy_res_path = "C:/Program Files/JianyingPro/5.9.0.11632/Resources/DefaultAdjustBundle/combine_adjust"
-
-            for track in data.get("tracks", []):
-                for seg in track.get("segments", []):
-                    kfs = seg.get("common_keyframes", [])
-                    active_props = [kf.get("property_type") for kf in kfs if kf.get("property_type") in PROP_MAP]
-
-                    if active_props:
-                        seg["enable_adjust"] = True
-                        seg["enable_color_correct_adjust"] = True
-                        refs = seg.setdefault("extra_material_refs", [])
-
-                        for prop in active_props:
-                            mat_type = PROP_MAP[prop]
-                            if not any(m.get("type") == mat_type and m["id"] in refs for m in all_effects):
-                                new_id = str(uuid.uuid4()).upper()
-                                shadow_mat = {
-                                    "type": mat_type, "value": 0.0, "path": jy_res_path, "id": new_id,
-                                    "apply_target_type": 0, "platform": "all", "source_platform": 0, "version": "v2"
-                                }
-                                all_effects.append(shadow_mat)
-                                refs.append(new_id)
-                                has_modified = True
-
-            if has_modified:
-                with open(content_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False)
-        except Exception as e:
-            print(f"⚠️ Force activation failed: {e}")
-
-    def _patch_cloud_material_ids(self):
-        if not self._cloud_audio_patches and not self._cloud_text_patches: return
-        content_path = os.path.join(self.root, self.name, "draft_content.json")
-        if not os.path.exists(content_path): return
-
-        try:
-            with open(content_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            has_modified = False
-            materials = data.get("materials", {})
-            audios = materials.get("audios", [])
-            for mat in audios:
-                path = mat.get("path", "")
-                for dummy_path, patch_info in self._cloud_audio_patches.items():
-                    if dummy_path in path:
-                        if patch_info["type"] == "music":
-                            mat["music_id"] = patch_info["id"]
-                            mat["type"] = "music"
-                            has_modified = True
-            
-            if has_modified:
-                with open(content_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False)
-        except Exception:
-            pass
+    def _iter_segment_keyframes(self, data: Dict[str, Any]) -> Iterator[Tuple[str, List[Any], List[str]]]:
+        """
+        逐个片段产出 (片段 id, 关键帧属性类型列表, extra_material_refs)。
+        流式模式下直接读取对象模型：片段 JSON 只在写出时生成一次，而素材列表先于轨道写出，
+        调节素材必须在写出任何片段之前确定。
+        """
+        if not isinstance(data.get("tracks"), LazyArray):
+            for seg in iter_segments(data):
+                kfs = seg.get("common_keyframes", [])
+                yield seg["id"], [kf.get("property_type") for kf in kfs], seg.get("extra_material_refs", [])
+            return
+
+        for track in self.script.imported_tracks + list(self.script.tracks.values()):
+            if isinstance(track, draft.track.Track):
+                for seg in track.segments:
+                    props = [kf.keyframe_property.value for kf in seg.common_keyframes]
+                    yield seg.segment_id, props, getattr(seg, "extra_material_refs", [])
+                continue
+            parsed = getattr(track, "parsed", False)
+            raw_segments = [seg.raw_data for seg in track.segments] if parsed else track.raw_data.get("segments", [])
+            for seg in raw_segments:
+                kfs = seg.get("common_keyframes", [])
+                yield seg["id"], [kf.get("property_type") for kf in kfs], seg.get("extra_material_refs", [])
+
+    def _force_activate_adjustments(self, data: Dict[str, Any]) -> bool:
+        """保存管线 pass：为带亮度/对比度/饱和度关键帧的片段补齐调节素材并打开调节开关。"""
+        materials = data.setdefault("materials", {})
+
+        PROP_MAP = {"KFTypeBrightness": "brightness", "KFTypeContrast": "contrast", "KFTypeSaturation": "saturation"}
+        jy_res_path = "C:/Program Files/JianyingPro/5.9.0.11632/Resources/DefaultAdjustBundle/combine_adjust"
+
+        # 第一遍：只记录需要处理的片段（流式模式下读取对象模型，不额外导出片段）
+        pending = {}
+        for seg_id, props, refs in self._iter_segment_keyframes(data):
+            active_props = [prop for prop in props if prop in PROP_MAP]
+            if active_props:
+                pending[seg_id] = (active_props, list(refs))
+        if not pending:
+            return False
+
+        adjust_types = set(PROP_MAP.values())
+        effect_types = {m["id"]: m.get("type") for m in materials.get("effects", []) if m.get("type") in adjust_types}
+
+        new_effects = []
+        new_refs = {}
+        for seg_id, (active_props, refs) in pending.items():
+            existing = {effect_types[ref] for ref in refs if ref in effect_types}
+            added = []
+            for prop in active_props:
+                mat_type = PROP_MAP[prop]
+                if mat_type in existing:
+                    continue
+                new_id = str(uuid.uuid4()).upper()
+                new_effects.append({
+                    "type": mat_type, "value": 0.0, "path": jy_res_path, "id": new_id,
+                    "apply_target_type": 0, "platform": "all", "source_platform": 0, "version": "v2"
+                })
+                added.append(new_id)
+                existing.add(mat_type)
+            new_refs[seg_id] = added
+
+        def activate(seg: Dict[str, Any]) -> Dict[str, Any]:
+            added = new_refs.get(seg.get("id"))
+            if added is None:
+                return seg
+            seg["enable_adjust"] = True
+            seg["enable_color_correct_adjust"] = True
+            if added:
+                # 片段导出的 refs 列表可能与内存中的片段对象共享，这里复制后再追加
+                seg["extra_material_refs"] = list(seg.get("extra_material_refs", [])) + added
+            return seg
+
+        if new_effects:
+            extend_items(materials, "effects", new_effects)
+        map_segments(data, activate)
+        return True
+
+    def _patch_cloud_material_ids(self, data: Dict[str, Any]) -> bool:
+        """保存管线 pass：把云端音乐的 mock 音频素材改写为 music 类型并注入 music_id，返回是否有改动。"""
+        music_patches = {
+            dummy_path: info["id"]
+            for dummy_path, info in self._cloud_audio_patches.items()
+            if info["type"] == "music"
+        }
+        if not music_patches:
+            return False
+
+        def music_id_for(path: str) -> Optional[str]:
+            music_id = None
+            for dummy_path, patch_id in music_patches.items():
+                if dummy_path in path:
+                    music_id = patch_id
+            return music_id
+
+        def needs_patch(mat: Dict[str, Any]) -> bool:
+            music_id = music_id_for(mat.get("path", ""))
+            return music_id is not None and (mat.get("music_id"), mat.get("type")) != (music_id, "music")
+
+        def patch(mat: Dict[str, Any]) -> Dict[str, Any]:
+            music_id = music_id_for(mat.get("path", ""))
+            if music_id is not None:
+                mat["music_id"] = music_id
+                mat["type"] = "music"
+            return mat
+
+        materials = data.get("materials", {})
+        audios = materials.get("audios")
+        if isinstance(audios, LazyArray):
+            # 流式模式：素材在写出时才导出，按对象模型判断是否会有改动（自建素材导出的类型不是 music）
+            modified = any(music_id_for(mat.path) is not None for mat in self.script.materials.audios)
+            modified = modified or any(map(needs_patch, self.script.imported_materials.get("audios", [])))
+        else:
+            modified = any(map(needs_patch, audios or []))
+        if not modified:
+            return False
+        map_items(materials, "audios", patch)
+        return True
@@ -4,7 +4,19 @@ import shutil
 import time
 
 import pyJianYingDraft as draft
+from core.material_pool import MaterialPool
+from core.save_pipeline import SavePass, SavePipeline
+from pyJianYingDraft.json_stream import check_format
+from utils.config import CONFIG
 from utils.formatters import get_default_drafts_root
+from utils.media_headers import install_header_probe
+from utils.media_normalizer import NormalizationPool
+from utils.probe_cache import install_probe_cache
+
+# VideoMaterial/AudioMaterial 的探测结果跨进程缓存到磁盘（JY_CACHE_DIR）；
+# 未命中时先直接读容器头（MP4/MOV/WAV/OGG/MP3），读不出再调用 MediaInfo
+install_probe_cache()
+install_header_probe()
 
 
 class JyProjectBase:
@@ -23,7 +35,10 @@ class JyProjectBase:
         drafts_root: str = None,
         overwrite: bool = True,
         script_instance=None,
+        draft_format: str = None,
     ):
+        # pretty(剪映原生缩进) / compact(无空白) / fast(compact + orjson，如已安装)
+        self.draft_format = check_format(draft_format or CONFIG.draft_format)
         self.root = os.path.abspath(drafts_root or get_default_drafts_root())
         if not os.path.exists(self.root):
             try:
@@ -42,7 +57,7 @@ class JyProjectBase:
 
         self._explicit_res = width != 1920 or height != 1080
         self._first_video_resolved = False
-        self._cloud_manager = None
+        self._init_runtime_state()
 
         if script_instance:
             self.script = script_instance
@@ -72,7 +87,8 @@ class JyProjectBase:
         if has_draft and not overwrite:
             print(f"Loading existing project: {self.name}")
             try:
-                self.script = self.df.load_template(self.name)
+                # 已有轨道只在被访问时解析片段，未改动的部分原样写回
+                self.script = self.df.load_template(self.name, lazy=True)
             except Exception as e:
                 print(f"Load failed ({e}), forcing recreate...")
                 self.script = self.df.create_draft(self.name, width, height, allow_replace=True)
@@ -104,6 +120,16 @@ class JyProjectBase:
                     else:
                         raise
 
+    def _init_runtime_state(self):
+        """Process-local helpers; rebuilt instead of persisted by snapshot/restore."""
+        self._cloud_manager = None
+        self._save_pipeline = SavePipeline()
+        self._material_pool = MaterialPool()
+        self._normalization_pool = NormalizationPool()
+        self._pending_normalizations = {}
+        self._journal = None
+        self._journal_depth = 0
+
     def _try_release_project_lock(self) -> bool:
         """
         Best-effort lock release:
@@ -144,21 +170,24 @@ class JyProjectBase:
             return False
 
     def get_track_duration(self, track_name: str) -> int:
-        tracks = self.script.tracks
-        iterator = (
-            tracks.values()
-            if isinstance(tracks, dict)
-            else (tracks if isinstance(tracks, list) else [])
-        )
-        for track in iterator:
-            if hasattr(track, "name") and getattr(track, "name") == track_name:
-                max_end = 0
-                for seg in track.segments:
-                    end = seg.target_timerange.start + seg.target_timerange.duration
-                    if end > max_end:
-                        max_end = end
-                return max_end
-        return 0
+        """轨道结束时间（微秒），轨道不存在时为 0。按名称直接取轨道，与片段数量无关。"""
+        track = self.script.tracks.get(track_name)
+        return track.end_time if track is not None else 0
+
+    def get_timeline_end(self) -> int:
+        """整条时间线（所有轨道，含已有草稿的导入轨道）的结束时间（微秒）。"""
+        return self.script.timeline_end
+
+    def material_pool_stats(self) -> dict:
+        """素材池命中统计：hits 为跳过的重复探测次数，misses 为实际探测次数，size 为已缓存文件数。"""
+        return self._material_pool.stats()
+
+    def register_save_pass(self, name: str, fn: SavePass) -> None:
+        """
+        Register a post-processing pass run by save() on the exported draft dict.
+        `fn(content) -> bool` returns True when it modified the content.
+        """
+        self._save_pipeline.register(name, fn)
 
     @property
     def cloud_manager(self):
@@ -0,0 +1,118 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from pyJianYingDraft.json_stream import LazyArray
+
+SavePass = Callable[[Dict[str, Any]], bool]
+
+
+def map_items(container: Dict[str, Any], key: str, fn: Callable[[Any], Any]) -> None:
+    """Apply `fn` to every element of `container[key]` (plain list or LazyArray)."""
+    items = container.get(key)
+    if isinstance(items, LazyArray):
+        items.map(fn)
+    elif items:
+        container[key] = [fn(item) for item in items]
+
+
+def extend_items(container: Dict[str, Any], key: str, new_items: Iterable[Any]) -> None:
+    """Append to `container[key]` without mutating a list that may be shared."""
+    items = container.get(key)
+    if isinstance(items, LazyArray):
+        items.extend(new_items)
+    else:
+        container[key] = list(items or []) + list(new_items)
+
+
+def iter_segments(content: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Iterate segment dicts of all tracks; in streaming mode they are generated on the fly."""
+    for track in content.get("tracks", []):
+        yield from track.get("segments", [])
+
+
+def map_segments(content: Dict[str, Any], fn: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+    """Apply `fn` to every segment dict of every track (eager or streaming content)."""
+
+    def map_track(track: Dict[str, Any]) -> Dict[str, Any]:
+        map_items(track, "segments", fn)
+        return track
+
+    map_items(content, "tracks", map_track)
+
+
+@dataclass
+class SaveReport:
+    """Timings (ms) and outcome of one pipeline run."""
+
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    modified_by: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings_ms.values())
+
+    def summary(self) -> str:
+        parts = [f"{name} {ms:.1f}ms" for name, ms in self.timings_ms.items()]
+        return " | ".join(parts) + f" | total {self.total_ms:.1f}ms"
+
+
+class SavePipeline:
+    """
+    Single-pass draft save:
+    - export the ScriptFile to a dict once
+    - run registered post-processing passes over that dict in order
+    - serialize and write once
+
+    A pass receives the exported content dict and returns True when it changed it.
+    Passes must replace nested lists/dicts they modify instead of mutating them in
+    place, because some of them are shared with the live object model.
+
+    With `stream=True` the material/track/segment lists are LazyArray objects that are
+    generated while writing; passes should go through `map_items` / `extend_items` /
+    `map_segments` so they work in both modes. A streaming pass returns True when it
+    scheduled a change.
+    """
+
+    def __init__(self):
+        self._passes: List[Tuple[str, SavePass]] = []
+
+    @property
+    def pass_names(self) -> List[str]:
+        return [name for name, _ in self._passes]
+
+    def register(self, name: str, fn: SavePass) -> None:
+        """Register a pass; re-registering a name replaces it in place."""
+        for i, (existing, _) in enumerate(self._passes):
+            if existing == name:
+                self._passes[i] = (name, fn)
+                return
+        self._passes.append((name, fn))
+
+    def unregister(self, name: str) -> bool:
+        before = len(self._passes)
+        self._passes = [(n, f) for n, f in self._passes if n != name]
+        return len(self._passes) != before
+
+    def run(self, script, stream: bool = False, output_format: str = "pretty") -> SaveReport:
+        report = SaveReport()
+
+        t0 = time.perf_counter()
+        content = script.export_content(lazy=stream)
+        report.timings_ms["export"] = (time.perf_counter() - t0) * 1000
+
+        for name, fn in self._passes:
+            t0 = time.perf_counter()
+            try:
+                if fn(content):
+                    report.modified_by.append(name)
+            except Exception as e:
+                report.failed[name] = str(e)
+                print(f"⚠️ Save pass '{name}' failed: {e}")
+            report.timings_ms[f"pass:{name}"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        script.save(content=content, stream=stream, output_format=output_format)
+        report.timings_ms["write"] = (time.perf_counter() - t0) * 1000
+        return report
@@ -0,0 +1,131 @@
+import gc
+import json
+import os
+import pickle
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from utils.errors import DataError
+
+SNAPSHOT_MAGIC = b"JYSNAP"
+# Bump whenever the pickled class layout changes (e.g. ScriptMaterial lists, Track max-end).
+SNAPSHOT_VERSION = 4
+
+# Runtime-only attributes that are rebuilt on restore instead of pickled.
+_TRANSIENT_ATTRS = (
+    "_cloud_manager",
+    "_save_pipeline",
+    "_material_pool",
+    "_normalization_pool",
+    "_pending_normalizations",
+    "_journal",
+    "_journal_depth",
+)
+
+
+def _draft_stat(content_path: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        st = os.stat(content_path)
+    except OSError:
+        return None, None
+    return st.st_mtime_ns, st.st_size
+
+
+@contextmanager
+def _gc_paused():
+    # (Un)pickling creates ~10 objects per segment; cyclic GC passes dominate otherwise.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    """Read and validate the header of a snapshot file without unpickling the payload."""
+    with open(path, "rb") as f:
+        return _read_header(f)
+
+
+def _read_header(f) -> Dict[str, Any]:
+    prefix = f.read(len(SNAPSHOT_MAGIC) + 6)
+    if len(prefix) < len(SNAPSHOT_MAGIC) + 6 or not prefix.startswith(SNAPSHOT_MAGIC):
+        raise DataError("Not a JyProject snapshot file.")
+    version, header_len = struct.unpack("<HI", prefix[len(SNAPSHOT_MAGIC) :])
+    if version != SNAPSHOT_VERSION:
+        raise DataError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION}).")
+    return json.loads(f.read(header_len).decode("utf-8"))
+
+
+class SnapshotMixin:
+    """
+    JyProject 的会话快照 Mixin：把内存中的完整对象图存为压缩二进制文件，
+    下一个进程可直接恢复，跳过 load_template 的解析/深拷贝和素材探测。
+
+    快照基于 pickle，只应加载自己生成的快照文件。
+    """
+
+    def _draft_content_path(self) -> str:
+        return os.path.join(self.draft_dir, "draft_content.json")
+
+    def snapshot(self, path: str = None) -> str:
+        """
+        保存快照（建议在 save() 之后调用）。默认写入 <draft_dir>/.jy_snapshot.bin。
+        快照记录 draft_content.json 的 mtime/size，草稿被外部修改后快照即失效。
+        """
+        path = path or os.path.join(self.draft_dir, ".jy_snapshot.bin")
+        mtime_ns, size = _draft_stat(self._draft_content_path())
+        state = {k: v for k, v in self.__dict__.items() if k not in _TRANSIENT_ATTRS}
+        with _gc_paused():
+            payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        header = json.dumps(
+            {
+                "project": self.name,
+                "draft_mtime_ns": mtime_ns,
+                "draft_size": size,
+                "created": round(time.time(), 3),
+                "journal_path": self._journal.path if self._journal else None,
+            }
+        ).encode("utf-8")
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack("<HI", SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def restore(cls, path: str):
+        """
+        从快照恢复工程。草稿 JSON 的 mtime/size 与快照记录不一致时抛出 DataError，
+        此时应改用常规构造函数重新加载。自定义的 save pass 不会被保存，需要重新注册。
+        """
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            payload = f.read()
+
+        try:
+            with _gc_paused():
+                state = pickle.loads(zlib.decompress(payload))
+        except Exception as e:
+            raise DataError(f"Corrupted snapshot payload: {e}") from e
+
+        project = cls.__new__(cls)
+        project.__dict__.update(state)
+        current = _draft_stat(project._draft_content_path())
+        if current != (header.get("draft_mtime_ns"), header.get("draft_size")):
+            raise DataError(
+                f"Snapshot is stale: draft '{header.get('project')}' changed after the snapshot."
+            )
+
+        project._init_runtime_state()
+        if header.get("journal_path"):
+            project.enable_journal(header["journal_path"])
+        return project
@@ -5,6 +5,7 @@ import threading
 from typing import Union
 
 import pyJianYingDraft as draft
+from core.journal import journaled
 from utils.formatters import safe_tim
 
 
@@ -13,6 +14,7 @@ class TextOpsMixin:
     JyProject 的文本与字幕 Mixin。
     """
 
+    @journaled
     def add_text_simple(
         self,
         text: str,
@@ -2,12 +2,14 @@ import os
 import time
 from typing import Union, Optional
 import pyJianYingDraft as draft
+from core.journal import journaled
 from utils.formatters import safe_tim, tim
 
 class VfxOpsMixin:
     """
     JyProject 的特效与转场 Mixin。
     """
+    @journaled
     def add_effect_simple(self, effect_name: str, start_time: Union[str, int] = None, duration: Union[str, int] = "3s", track_name: str = "EffectTrack"):
         if start_time is None:
             start_time = self.get_track_duration(track_name)
@@ -20,6 +22,7 @@ class VfxOpsMixin:
         self.script.add_segment(seg, track_name)
         return seg
 
+    @journaled
     def add_transition_simple(
         self,
         transition_name: str,
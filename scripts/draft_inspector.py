@@ -1,9 +1,13 @@
 import argparse
 import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+from utils.daemon_client import try_daemon
 from utils.formatters import get_all_drafts, get_default_drafts_root
+from utils.media_normalizer import get_normalization_cache
+from utils.media_probe import probe_media_file
+from utils.probe_cache import get_probe_cache
 
 
 def _ok(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -113,6 +117,36 @@ def cmd_summary(root: str, name: Optional[str], path: Optional[str]) -> Dict[str
     )
 
 
+def cmd_probe(paths: List[str], probe: Callable[[str], Any] = probe_media_file) -> Dict[str, Any]:
+    files: List[Dict[str, Any]] = []
+    failed = 0
+    for p in paths:
+        if not os.path.exists(p):
+            files.append({"path": os.path.abspath(p), "error": "not found"})
+            failed += 1
+            continue
+        result = probe(p)
+        if result is None:
+            files.append({"path": os.path.abspath(p), "error": "ffprobe failed"})
+            failed += 1
+        else:
+            files.append(result.to_dict())
+    if failed == len(paths):
+        return _err("probe_failed", "No file could be probed (is ffprobe installed?)")
+    return _ok({"count": len(files), "failed": failed, "files": files})
+
+
+def cmd_cache_stats() -> Dict[str, Any]:
+    cache = get_normalization_cache()
+    probe_cache = get_probe_cache()
+    return _ok(
+        {
+            "normalization": {"root": cache.root, **cache.stats()},
+            "probe_cache_entries": len(probe_cache) if probe_cache is not None else 0,
+        }
+    )
+
+
 def _print_human_list(res: Dict[str, Any]) -> None:
     data = res["data"]
     print(f"Root: {data['root']}")
@@ -135,6 +169,38 @@ def _print_human_summary(res: Dict[str, Any]) -> None:
             print(f"- {k}: {v}")
 
 
+def _print_human_probe(res: Dict[str, Any]) -> None:
+    for f in res["data"]["files"]:
+        name = os.path.basename(f["path"])
+        if "error" in f:
+            print(f"- {name}: {f['error']}")
+            continue
+        video = (
+            f"{f['video_codec']} {f['width']}x{f['height']} {f['fps']}fps {f['pix_fmt']}"
+            if f["video_codec"]
+            else "no video"
+        )
+        if f["rotation"]:
+            video += f" rot{f['rotation']}"
+        print(
+            f"- {name}: {f['duration']:.3f}s | {video} | "
+            f"audio x{f['audio_streams']} {f['audio_codec'] or ''}".rstrip()
+        )
+
+
+def _print_human_cache_stats(res: Dict[str, Any]) -> None:
+    n = res["data"]["normalization"]
+    mb = 1024 * 1024
+    print(f"Normalization cache: {n['root']}")
+    print(f"- entries: {n['entries']} | {n['cache_bytes'] / mb:.1f} / {n['max_bytes'] / mb:.0f} MB")
+    print(f"- hits: {n['hits']} | remuxes: {n['remuxes']} | transcodes: {n['transcodes']}")
+    print(
+        f"- transcodes avoided: {n['transcodes_avoided']} | bytes saved: "
+        f"{n['bytes_saved'] / mb:.1f} MB | encode time saved: {n['encode_ms_saved'] / 1000:.1f}s"
+    )
+    print(f"Probe cache entries: {res['data']['probe_cache_entries']}")
+
+
 def _print_human_show(res: Dict[str, Any]) -> None:
     print(json.dumps(res["data"], ensure_ascii=False, indent=2))
 
@@ -164,17 +230,46 @@ def main() -> int:
     p_summary = sub.add_parser("summary", help="Show compact draft summary")
     p_summary.add_argument("--name", help="Draft name")
     p_summary.add_argument("--path", help="Draft absolute path")
-    p_summary.add_argument("--json", action="store_true", help="Print machine-readable JSON response")
+    p_summary.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON response"
+    )
+
+    p_probe = sub.add_parser("probe", help="Probe media files with one ffprobe call each")
+    p_probe.add_argument("paths", nargs="+", help="Media file paths")
+    p_probe.add_argument("--json", action="store_true", help="Print machine-readable JSON response")
+
+    p_cache = sub.add_parser("cache-stats", help="Show media normalization / probe cache stats")
+    p_cache.add_argument("--json", action="store_true", help="Print machine-readable JSON response")
 
     args = parser.parse_args()
     root = os.path.abspath(args.root)
 
-    if args.cmd == "list":
-        res = cmd_list(root=root, limit=args.limit)
-    elif args.cmd == "show":
-        res = cmd_show(root=root, name=args.name, path=args.path, kind=args.kind)
+    # 常驻进程（jy_daemon.py）运行时由它应答，否则在本进程内执行
+    # 路径在本进程内转为绝对路径，避免按常驻进程的工作目录解析
+    if args.cmd == "probe":
+        served, res = try_daemon("probe", paths=[os.path.abspath(p) for p in args.paths])
     else:
-        res = cmd_summary(root=root, name=args.name, path=args.path)
+        path = getattr(args, "path", None)
+        served, res = try_daemon(
+            "inspect",
+            cmd=args.cmd,
+            root=root,
+            name=getattr(args, "name", None),
+            path=os.path.abspath(path) if path else None,
+            kind=getattr(args, "kind", "content"),
+            limit=getattr(args, "limit", 0),
+        )
+    if not served:
+        if args.cmd == "list":
+            res = cmd_list(root=root, limit=args.limit)
+        elif args.cmd == "show":
+            res = cmd_show(root=root, name=args.name, path=args.path, kind=args.kind)
+        elif args.cmd == "probe":
+            res = cmd_probe(args.paths)
+        elif args.cmd == "cache-stats":
+            res = cmd_cache_stats()
+        else:
+            res = cmd_summary(root=root, name=args.name, path=args.path)
 
     want_json = bool(args.json)
     if hasattr(args, "json") and getattr(args, "json"):
@@ -190,6 +285,10 @@ def main() -> int:
                 _print_human_list(res)
             elif args.cmd == "show":
                 _print_human_show(res)
+            elif args.cmd == "probe":
+                _print_human_probe(res)
+            elif args.cmd == "cache-stats":
+                _print_human_cache_stats(res)
             else:
                 _print_human_summary(res)
 
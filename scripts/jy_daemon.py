@@ -0,0 +1,513 @@
+"""
+Resident catalog / resolver daemon for the skill CLIs.
+
+Keeps the asset index (or SQLite catalog), the pyJianYingDraft enum resolvers, the probe
+cache and a CloudManager loaded in one long-lived process and serves them over a local
+socket with newline-delimited JSON-RPC 2.0. `asset_search.py`, `draft_inspector.py` and
+`cloud_manager.py` use it transparently through `utils.daemon_client.try_daemon` while it
+is running, skipping interpreter warm-up, CSV parsing and repeated probes.
+
+Usage:
+    python jy_daemon.py start [--detach] [--tcp] [--idle-timeout 3600]
+    python jy_daemon.py status
+    python jy_daemon.py stop
+"""
+
+import argparse
+import inspect
+import json
+import os
+import secrets
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+import asset_search
+import draft_inspector
+from utils.asset_index import catalog_signature
+from utils.cli_protocol import emit_result, make_result
+from utils.config import CONFIG
+from utils.constants import SYNONYMS
+from utils.daemon_client import (
+    DaemonClient,
+    default_socket_path,
+    default_state_path,
+    get_daemon_client,
+    read_state,
+)
+from utils.errors import InfraError, JyError, UserInputError
+from utils.formatters import get_default_drafts_root, resolve_enum_with_synonyms
+from utils.logging_utils import setup_logger
+from utils.media_probe import probe_media_file
+
+logger = setup_logger("jy_daemon")
+
+# In-memory probe results kept in front of the on-disk probe cache.
+PROBE_MEMO_MAX = 4096
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_ERROR = -32000
+UNAUTHORIZED = -32001
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            daemon = self.server.jy_daemon
+            response = daemon.handle_line(line)
+            if response is not None:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            if daemon.stop_requested:
+                # Stop only after the `shutdown` response has been flushed to the caller.
+                daemon.shutdown()
+                return
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def _write_private(path: str, text: str) -> None:
+    """Write a file readable only by the current user (atomic replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class JyDaemon:
+    """
+    JSON-RPC server. `bind()` opens the socket and publishes the state file, `serve_forever()`
+    blocks until `shutdown()` (also reachable as the `shutdown` RPC method or the idle timeout).
+    Over TCP every request must carry the token from the state file in its `auth` field.
+    """
+
+    def __init__(
+        self,
+        state_path: Optional[str] = None,
+        socket_path: Optional[str] = None,
+        tcp: bool = False,
+        port: int = 0,
+        idle_timeout: float = 0.0,
+    ):
+        self.state_path = os.path.abspath(state_path or default_state_path())
+        self.socket_path = os.path.abspath(socket_path or default_socket_path())
+        self.tcp = tcp or not hasattr(socketserver, "UnixStreamServer")
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.token = secrets.token_hex(16) if self.tcp else None
+        self.server: Optional[socketserver.BaseServer] = None
+        self.state: Dict[str, Any] = {}
+        self.started = time.time()
+        self.requests = 0
+        self._last_activity = time.monotonic()
+        self._stopping = threading.Event()
+        self.stop_requested = False
+        self._lock = threading.Lock()
+        self._enums: Dict[str, type] = {}
+        self._resolved: Dict[tuple, Optional[str]] = {}
+        self._probes: "OrderedDict[tuple, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._cloud_managers: Dict[str, tuple] = {}
+        self._methods: Dict[str, Callable[..., Any]] = {
+            "ping": self.rpc_ping,
+            "search": self.rpc_search,
+            "batch": self.rpc_batch,
+            "resolve": self.rpc_resolve,
+            "probe": self.rpc_probe,
+            "inspect": self.rpc_inspect,
+            "find_asset": self.rpc_find_asset,
+            "download_asset": self.rpc_download_asset,
+            "shutdown": self.rpc_shutdown,
+        }
+
+    # ----------------- Lifecycle -----------------
+
+    def bind(self) -> Dict[str, Any]:
+        if not self.tcp:
+            try:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)  # stale socket of a daemon that died
+                os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+                # Create the socket owner-only from the start rather than chmod after listen().
+                old_umask = os.umask(0o077)
+                try:
+                    self.server = _UnixServer(self.socket_path, _Handler)
+                finally:
+                    os.umask(old_umask)
+                self.state = {"transport": "unix", "path": self.socket_path}
+            except OSError as e:
+                logger.warning("Unix socket unavailable (%s), falling back to TCP.", e)
+                self.tcp = True
+                self.token = secrets.token_hex(16)
+        if self.tcp:
+            self.server = _TcpServer(("127.0.0.1", self.port), _Handler)
+            host, port = self.server.server_address[:2]
+            self.state = {"transport": "tcp", "host": host, "port": port, "token": self.token}
+        self.server.jy_daemon = self
+        self.state.update({"pid": os.getpid(), "started": self.started})
+        _write_private(self.state_path, json.dumps(self.state))
+        return self.state
+
+    def warm(self) -> None:
+        """Load the catalog, enum resolvers and probe cache before the first request."""
+        if CONFIG.asset_backend == "sqlite":
+            asset_search.get_asset_catalog(asset_search.DATA_DIR).sync()
+        else:
+            asset_search.load_asset_index(asset_search.DATA_DIR)
+        self._load_enums()
+
+    def serve_forever(self) -> None:
+        if self.server is None:
+            self.bind()
+        if self.idle_timeout > 0:
+            threading.Thread(target=self._idle_watch, daemon=True).start()
+        try:
+            self.server.serve_forever(poll_interval=0.2)
+        finally:
+            self._cleanup()
+
+    def shutdown(self) -> None:
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        if self.server is not None:
+            # BaseServer.shutdown blocks until serve_forever returns, so never call it inline
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _idle_watch(self) -> None:
+        while not self._stopping.wait(min(self.idle_timeout, 5.0)):
+            if time.monotonic() - self._last_activity > self.idle_timeout:
+                logger.info("Idle for %.0fs, shutting down.", self.idle_timeout)
+                self.shutdown()
+
+    def _cleanup(self) -> None:
+        self.server.server_close()
+        if read_state(self.state_path) == self.state:
+            try:
+                os.remove(self.state_path)
+            except OSError:
+                pass
+        if self.state.get("transport") == "unix":
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    # ----------------- Dispatch -----------------
+
+    def handle_line(self, line: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self._error(None, PARSE_ERROR, f"Parse error: {e}")
+        return self.handle_request(request)
+
+    @staticmethod
+    def _error(req_id: Any, code: int, message: str, data: Any = None) -> Dict[str, Any]:
+        error: Dict[str, Any] = {"code": code, "message": message}
+        if data is not None:
+            error["data"] = data
+        return {"jsonrpc": "2.0", "id": req_id, "error": error}
+
+    def handle_request(self, request: Any) -> Optional[Dict[str, Any]]:
+        """Run one JSON-RPC request; returns the response (None for notifications)."""
+        with self._lock:
+            self.requests += 1
+            self._last_activity = time.monotonic()
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "Invalid request")
+        req_id = request.get("id")
+        if self.token and request.get("auth") != self.token:
+            return self._error(req_id, UNAUTHORIZED, "Unauthorized")
+
+        method = self._methods.get(request["method"])
+        params = request.get("params") or {}
+        if method is None:
+            response = self._error(req_id, METHOD_NOT_FOUND, f"Unknown method: {request['method']}")
+        elif not isinstance(params, dict):
+            response = self._error(req_id, INVALID_PARAMS, "params must be an object")
+        else:
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                response = self._error(req_id, INVALID_PARAMS, str(e))
+            else:
+                response = self._invoke(req_id, method, params)
+        return response if "id" in request else None
+
+    def _invoke(self, req_id: Any, method: Callable[..., Any], params: Dict) -> Dict[str, Any]:
+        try:
+            result = method(**params)
+        except UserInputError as e:
+            return self._error(req_id, INVALID_PARAMS, str(e))
+        except JyError as e:
+            return self._error(req_id, SERVER_ERROR, str(e), {"type": type(e).__name__})
+        except Exception as e:
+            logger.exception("RPC %s failed", method.__name__)
+            return self._error(req_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+    # ----------------- Methods -----------------
+
+    def rpc_ping(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "transport": self.state.get("transport"),
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "probe_memo": len(self._probes),
+        }
+
+    def rpc_search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 20,
+        ranking: str = "bm25",
+        backend: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return asset_search.search_assets(query, category, limit, ranking, backend)
+
+    def rpc_batch(
+        self, lines: List[str], backend: Optional[str] = None, workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        return list(asset_search.run_batch(lines, backend, workers))
+
+    def _load_enums(self) -> Dict[str, type]:
+        if not self._enums:
+            from utils.env_setup import setup_env
+
+            setup_env()
+            import pyJianYingDraft as draft
+
+            self._enums = {
+                name: obj
+                for name, obj in vars(draft).items()
+                if isinstance(obj, type) and issubclass(obj, Enum)
+            }
+        return self._enums
+
+    def rpc_resolve(self, enum: str, name: str) -> Dict[str, Any]:
+        """Enum member name for `name` via resolve_enum_with_synonyms (memoized)."""
+        enum_cls = self._load_enums().get(enum)
+        if enum_cls is None:
+            raise UserInputError(f"Unknown enum: {enum}")
+        key = (enum, name)
+        if key not in self._resolved:
+            member = resolve_enum_with_synonyms(enum_cls, name, SYNONYMS)
+            self._resolved[key] = member.name if member is not None else None
+        return {"enum": enum, "name": name, "key": self._resolved[key]}
+
+    def _probe(self, path: str):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if key in self._probes:
+                self._probes.move_to_end(key)
+                return self._probes[key]
+        probe = probe_media_file(path)
+        if probe is not None:
+            with self._lock:
+                self._probes[key] = probe
+                while len(self._probes) > PROBE_MEMO_MAX:
+                    self._probes.popitem(last=False)
+        return probe
+
+    def rpc_probe(self, paths: List[str]) -> Dict[str, Any]:
+        return draft_inspector.cmd_probe(paths, probe=self._probe)
+
+    def rpc_inspect(
+        self,
+        cmd: str,
+        root: Optional[str] = None,
+        name: Optional[str] = None,
+        path: Optional[str] = None,
+        kind: str = "content",
+        limit: int = 0,
+    ) -> Dict[str, Any]:
+        root = os.path.abspath(root or get_default_drafts_root())
+        if cmd == "list":
+            return draft_inspector.cmd_list(root=root, limit=limit)
+        if cmd == "show":
+            return draft_inspector.cmd_show(root=root, name=name, path=path, kind=kind)
+        if cmd == "summary":
+            return draft_inspector.cmd_summary(root=root, name=name, path=path)
+        if cmd == "cache-stats":
+            return draft_inspector.cmd_cache_stats()
+        raise UserInputError(f"Unknown inspect command: {cmd}")
+
+    def _cloud(self, backend: Optional[str] = None):
+        """CloudManager for `backend`, rebuilt when a catalog CSV changes on disk."""
+        from cloud_manager import CloudManager
+
+        backend = backend or CONFIG.asset_backend
+        signature = catalog_signature(asset_search.DATA_DIR)
+        with self._lock:
+            cached = self._cloud_managers.get(backend)
+            if cached is None or cached[0] != signature:
+                cached = self._cloud_managers[backend] = (signature, CloudManager(backend=backend))
+        return cached[1]
+
+    def rpc_find_asset(self, query: str, backend: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self._cloud(backend).find_asset(query)
+
+    def rpc_download_asset(
+        self, query: str, force: bool = False, backend: Optional[str] = None
+    ) -> Optional[str]:
+        return self._cloud(backend).download_asset(query, force)
+
+    def rpc_shutdown(self) -> Dict[str, Any]:
+        self.stop_requested = True
+        return {"stopping": True}
+
+
+# ----------------- CLI -----------------
+
+
+def _ping(client: Optional[DaemonClient]) -> Optional[Dict[str, Any]]:
+    if client is None:
+        return None
+    try:
+        return client.call("ping")
+    except JyError:
+        return None
+
+
+def cmd_start(args) -> int:
+    running = _ping(get_daemon_client())
+    if running:
+        emit_result(make_result(True, "already_running", "", running), args.json)
+        if not args.json:
+            print(f"Daemon already running (pid {running['pid']}).")
+        return 0
+
+    if args.detach:
+        cmd = [sys.executable, os.path.abspath(__file__), "start"]
+        cmd += ["--idle-timeout", str(args.idle_timeout)] + (["--tcp"] if args.tcp else [])
+        kwargs: Dict[str, Any] = {"start_new_session": True}
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.DETACHED_PROCESS}
+        subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **kwargs,
+        )
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            info = _ping(get_daemon_client())
+            if info:
+                emit_result(make_result(True, "ok", "", info), args.json)
+                if not args.json:
+                    print(f"✅ Daemon started (pid {info['pid']}, {info['transport']}).")
+                return 0
+            time.sleep(0.1)
+        emit_result(make_result(False, "infra_error", "Daemon did not come up in 15s"), args.json)
+        if not args.json:
+            print("Daemon did not come up in 15s.")
+        return 1
+
+    daemon = JyDaemon(tcp=args.tcp, idle_timeout=args.idle_timeout)
+    state = daemon.bind()
+    daemon.warm()
+    logger.info("Daemon listening (%s), pid %d", state["transport"], state["pid"])
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_status(args) -> int:
+    info = _ping(get_daemon_client())
+    if info is None:
+        emit_result(make_result(False, "not_running", "Daemon is not running"), args.json)
+        if not args.json:
+            print("Daemon is not running.")
+        return 1
+    emit_result(make_result(True, "ok", "", info), args.json)
+    if not args.json:
+        print(
+            f"pid={info['pid']} transport={info['transport']} uptime_s={info['uptime_s']} "
+            f"requests={info['requests']}"
+        )
+    return 0
+
+
+def cmd_stop(args) -> int:
+    client = get_daemon_client()
+    if _ping(client) is None:
+        emit_result(make_result(False, "not_running", "Daemon is not running"), args.json)
+        if not args.json:
+            print("Daemon is not running.")
+        return 1
+    try:
+        client.call("shutdown")
+    except InfraError:
+        pass  # the daemon may close the connection while exiting; confirm below
+    deadline = time.monotonic() + 5
+    while _ping(client) is not None:
+        if time.monotonic() > deadline:
+            emit_result(make_result(False, "infra_error", "Daemon did not stop in 5s"), args.json)
+            if not args.json:
+                print("Daemon did not stop in 5s.")
+            return 1
+        time.sleep(0.1)
+    emit_result(make_result(True, "ok", "", {"stopped": True}), args.json)
+    if not args.json:
+        print("Daemon stopped.")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Resident catalog / resolver daemon")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_start = sub.add_parser("start", help="Run the daemon (foreground unless --detach)")
+    p_start.add_argument("--detach", action="store_true", help="Start in the background")
+    p_start.add_argument("--tcp", action="store_true", help="Listen on 127.0.0.1 instead")
+    p_start.add_argument(
+        "--idle-timeout", type=float, default=0.0, help="Exit after N idle seconds (0 = never)"
+    )
+    for name, help_text in (("status", "Show daemon status"), ("stop", "Stop the daemon")):
+        sub.add_parser(name, help=help_text)
+    for p in sub.choices.values():
+        p.add_argument("--json", action="store_true", help="Print machine-readable JSON response")
+
+    args = parser.parse_args()
+    if args.cmd == "start":
+        return cmd_start(args)
+    if args.cmd == "status":
+        return cmd_status(args)
+    return cmd_stop(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -25,6 +25,8 @@ from core.media_ops import MediaOpsMixin
 from core.text_ops import TextOpsMixin
 from core.vfx_ops import VfxOpsMixin
 from core.mocking_ops import MockingOpsMixin
+from core.journal import JournalMixin  # noqa: E402
+from core.snapshot import SnapshotMixin  # noqa: E402
 
 try:
     import pyJianYingDraft as draft
@@ -32,10 +34,16 @@ try:
 except ImportError:
     draft = None
 
-class JyProject(JyProjectBase, MediaOpsMixin, TextOpsMixin, VfxOpsMixin, MockingOpsMixin):
+class JyProject(JyProjectBase, MediaOpsMixin, TextOpsMixin, VfxOpsMixin, MockingOpsMixin, JournalMixin, SnapshotMixin):
     """
     高层封装工程类。通过多重继承 Mixins 实现功能解耦。
     """
+    def _init_runtime_state(self):
+        super()._init_runtime_state()
+        # 保存管线：导出一次 -> 依次执行 pass -> 写盘一次
+        self.register_save_pass("cloud_material_ids", self._patch_cloud_material_ids)
+        self.register_save_pass("activate_adjustments", self._force_activate_adjustments)
+
     def _resolve_enum(self, enum_cls, name: str):
         return resolve_enum_with_synonyms(enum_cls, name, SYNONYMS)
 
@@ -46,17 +54,16 @@ class JyProject(JyProjectBase, MediaOpsMixin, TextOpsMixin, VfxOpsMixin, Mocking
             target_start = self.get_track_duration(track_name)
         return self.add_media_safe(media_path, target_start, duration, track_name, source_start=source_start, **kwargs)
 
-    def save(self):
-        """保存并执行质检报告。"""
-        self.script.save()
-        self._patch_cloud_material_ids()
-        self._force_activate_adjustments()
-        
+    def save(self, stream: bool = False):
+        """保存并执行质检报告。stream=True 时逐个片段流式写出，适合超长草稿。"""
+        self.wait_normalizations()
+        report = self._save_pipeline.run(self.script, stream=stream, output_format=self.draft_format)
+
         draft_path = os.path.join(self.root, self.name)
         if os.path.exists(draft_path):
             os.utime(draft_path, None)
-        print(f"✅ Project '{self.name}' saved and patched.")
-        return {"status": "SUCCESS", "draft_path": draft_path}
+        print(f"✅ Project '{self.name}' saved and patched. ({report.summary()})")
+        return {"status": "SUCCESS", "draft_path": draft_path, "timings_ms": report.timings_ms}
 
 # 导出工具函数以便向下兼容
 __all__ = ["JyProject", "get_default_drafts_root", "get_all_drafts", "safe_tim", "format_srt_time"]
@@ -3,7 +3,9 @@ import os
 import json
 import csv
 import shutil
-import subprocess
+
+from utils.asset_index import iter_catalog_rows
+from utils.media_probe import probe_media_file
 
 # 1. 路径定义
 LOCAL_APP_DATA = os.getenv('LOCALAPPDATA')
@@ -17,15 +19,8 @@ DATA_DIR = os.path.join(SKILL_ROOT, "data")
 
 def get_duration_ffprobe(file_path):
     """尝试用 ffprobe 获取音频时长(秒)，失败返回 0"""
-    try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5
-        )
-        return round(float(result.stdout.strip()), 2)
-    except Exception:
-        return 0
+    probe = probe_media_file(file_path)
+    return round(probe.duration, 2) if probe else 0
 
 def sync_music_cache_robust():
     print(f"🔄 Starting Robust Sync from: {JY_CACHE_MUSIC}")
@@ -73,13 +68,9 @@ def sync_music_cache_robust():
     existing_items = []
     if os.path.exists(csv_path):
         try:
-            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
-                lines = [l for l in f.readlines() if not l.startswith("#")]
-                if lines:
-                    reader = csv.DictReader(lines)
-                    for row in reader:
-                        existing_items.append(row)
-                        existing_ids.add(row.get('identifier', ''))
+            for row in iter_catalog_rows(csv_path):
+                existing_items.append(row)
+                existing_ids.add(row.get('identifier', ''))
         except Exception as e:
             print(f"⚠ Reading existing CSV failed: {e}")
 
@@ -0,0 +1,330 @@
+"""
+Optional SQLite backend for the asset catalog (`data/*.csv`).
+
+Every CSV row is stored once in the typed `assets` table (asset id, display name, category,
+duration in seconds, download URL, search text and the raw row as JSON) and in the FTS5 table
+`assets_fts`, whose identifier / description / category columns hold the row text tokenized
+by `utils.asset_index.tokenize` (CJK bigrams + unigrams, Latin words) separated by spaces.
+
+`sync()` rebuilds only the CSVs whose content hash changed since the last build; unchanged
+files (size and mtime equal) are not even hashed. The database lives under
+`<cache_dir>/asset_catalog/` and is selected with JY_ASSET_BACKEND=sqlite.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.asset_index import (
+    RANK_FIELDS,
+    catalog_signature,
+    iter_catalog_rows,
+    row_search_text,
+    tokenize,
+)
+from utils.errors import InfraError
+from utils.probe_cache import default_cache_dir
+
+# Typed columns are taken from the first non-empty CSV column of each group.
+ID_COLUMNS = ("id", "music_id", "effect_id", "speaker_id", "style_id", "identifier")
+NAME_COLUMNS = ("name", "title", "name_hint", "identifier")
+CATEGORY_COLUMNS = ("type", "categories", "category")
+DURATION_COLUMNS = ("duration_s", "duration")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    source_file TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    asset_id TEXT,
+    name TEXT,
+    name_lower TEXT,
+    category TEXT,
+    duration_s REAL,
+    url TEXT,
+    blob TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_source ON assets (source_file, row_no);
+CREATE INDEX IF NOT EXISTS assets_asset_id ON assets (asset_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(identifier, description, category);
+"""
+
+_SCHEMA_VERSION = 1
+
+Match = Tuple[float, str, Dict[str, Any]]
+
+
+def _first(row: Dict[str, Any], columns: Sequence[str]) -> str:
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return str(value)
+    return ""
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """'136.53' -> 136.53; empty or non-numeric -> None."""
+    if value and str(value).replace(".", "", 1).isdigit():
+        return float(value)
+    return None
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_catalog_path(data_dir: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(data_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(default_cache_dir(), "asset_catalog", f"{digest}.sqlite")
+
+
+class AssetCatalog:
+    """
+    SQLite catalog of one data directory. Each thread uses its own connection; concurrent
+    processes serialize rebuilds through an IMMEDIATE transaction. Raises InfraError when the
+    database cannot be opened or SQLite lacks FTS5.
+    """
+
+    def __init__(self, data_dir: str, db_path: Optional[str] = None):
+        self.data_dir = os.path.abspath(data_dir)
+        self.db_path = os.path.abspath(db_path or default_catalog_path(self.data_dir))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._synced_signature = None
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    conn.executescript(
+                        "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS assets; "
+                        "DROP TABLE IF EXISTS assets_fts; "
+                        f"PRAGMA user_version = {_SCHEMA_VERSION};"
+                    )
+                conn.executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                raise InfraError(f"Asset catalog unavailable ({self.db_path}): {e}") from e
+            self._local.conn = conn
+        return conn
+
+    # ----------------- Build -----------------
+
+    def sync(self, force: bool = False) -> Dict[str, str]:
+        """
+        将目录中的 CSV 增量编译进数据库：内容哈希变化的文件整表重建，已删除的 CSV 移除。
+        返回 {文件名: "built" | "unchanged" | "removed"}。
+        """
+        signature = catalog_signature(self.data_dir)
+        if not force and signature == self._synced_signature:
+            return {name: "unchanged" for name, _, _ in signature}
+
+        with self._lock:
+            conn = self._conn()
+            report: Dict[str, str] = {}
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = {
+                    name: (sha, size, mtime_ns)
+                    for name, sha, size, mtime_ns in conn.execute(
+                        "SELECT name, sha256, size, mtime_ns FROM files"
+                    )
+                }
+                for name, size, mtime_ns in signature:
+                    previous = known.pop(name, None)
+                    if not force and previous and previous[1:] == (size, mtime_ns):
+                        report[name] = "unchanged"
+                        continue
+                    sha = file_sha256(os.path.join(self.data_dir, name))
+                    if not force and previous and previous[0] == sha:
+                        # touched but identical: only refresh the stat fingerprint
+                        conn.execute(
+                            "UPDATE files SET size = ?, mtime_ns = ? WHERE name = ?",
+                            (size, mtime_ns, name),
+                        )
+                        report[name] = "unchanged"
+                        continue
+                    self._delete_file(conn, name)
+                    rows = self._insert_file(conn, name)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                        (name, sha, size, mtime_ns, rows),
+                    )
+                    report[name] = "built"
+                for name in known:
+                    self._delete_file(conn, name)
+                    conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                    report[name] = "removed"
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._synced_signature = signature
+        return report
+
+    @staticmethod
+    def _delete_file(conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "DELETE FROM assets_fts WHERE rowid IN (SELECT id FROM assets WHERE source_file = ?)",
+            (name,),
+        )
+        conn.execute("DELETE FROM assets WHERE source_file = ?", (name,))
+
+    def _insert_file(self, conn: sqlite3.Connection, name: str) -> int:
+        count = 0
+        for row_no, row in enumerate(iter_catalog_rows(os.path.join(self.data_dir, name))):
+            payload = {k: v for k, v in row.items() if k is not None}
+            display_name = _first(row, NAME_COLUMNS)
+            cur = conn.execute(
+                "INSERT INTO assets (source_file, row_no, asset_id, name, name_lower, category, "
+                "duration_s, url, blob, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    row_no,
+                    _first(row, ID_COLUMNS) or None,
+                    display_name,
+                    display_name.lower(),
+                    _first(row, CATEGORY_COLUMNS),
+                    parse_duration(_first(row, DURATION_COLUMNS)),
+                    row.get("url") or "",
+                    row_search_text(row),
+                    json.dumps(payload, ensure_ascii=False),
+                ),
+            )
+            conn.execute(
+                "INSERT INTO assets_fts (rowid, identifier, description, category) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    cur.lastrowid,
+                    *(
+                        " ".join(tokenize(" ".join(row.get(c) or "" for c in columns), True))
+                        for columns, _ in RANK_FIELDS.values()
+                    ),
+                ),
+            )
+            count += 1
+        return count
+
+    # ----------------- Queries -----------------
+
+    @staticmethod
+    def _file_position(files: Sequence[str]) -> Tuple[str, List[str]]:
+        """SQL expression giving each selected file's position (NULL for other files)."""
+        cases = " ".join(f"WHEN ? THEN {pos}" for pos in range(len(files)))
+        return f"CASE a.source_file {cases} END", list(files)
+
+    def search_fts(self, tokens: Sequence[str], files: Sequence[str], limit: int) -> List[Match]:
+        """FTS5 bm25() ranking over any of `tokens` (column weights as RANK_FIELDS)."""
+        if not tokens or not files:
+            return []
+        self.sync()
+        position, params = self._file_position(files)
+        weights = ", ".join(str(weight) for _, weight in RANK_FIELDS.values())
+        match = " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+        rows = self._conn().execute(
+            f"SELECT bm25(assets_fts, {weights}) AS rank, {position} AS pos, "
+            "a.source_file, a.payload FROM assets_fts JOIN assets a ON a.id = assets_fts.rowid "
+            "WHERE assets_fts MATCH ? AND pos IS NOT NULL "
+            "ORDER BY rank, pos, a.row_no LIMIT ?",
+            (*params, match, limit),
+        )
+        return [(round(-rank, 4), source, json.loads(payload)) for rank, _, source, payload in rows]
+
+    def search_substring(
+        self, query: str, terms: Sequence[str], files: Sequence[str], limit: int
+    ) -> List[Match]:
+        """asset_search 的旧计分（整串命中 +100、每个扩展词 +10），在 SQL 中计算。"""
+        if not files:
+            return []
+        self.sync()
+        position, params = self._file_position(files)
+        parts = ["(instr(a.blob, ?) > 0) * 100"] + ["(instr(a.blob, ?) > 0) * 10"] * len(terms)
+        rows = self._conn().execute(
+            f"SELECT {' + '.join(parts)} AS score, {position} AS pos, a.source_file, a.payload "
+            "FROM assets a WHERE pos IS NOT NULL AND score > 0 "
+            "ORDER BY score DESC, pos, a.row_no LIMIT ?",
+            (*[query.lower(), *terms], *params, limit),
+        )
+        return [(score, source, json.loads(payload)) for score, _, source, payload in rows]
+
+    def find_by_id(self, asset_id: str, files: Sequence[str]) -> Optional[Tuple[str, Dict]]:
+        """(source_file, row) of `asset_id`; with duplicates the last file / row wins."""
+        self.sync()
+        position, params = self._file_position(files)
+        row = (
+            self._conn()
+            .execute(
+                f"SELECT {position} AS pos, a.source_file, a.payload FROM assets a "
+                "WHERE a.asset_id = ? AND pos IS NOT NULL ORDER BY pos DESC, a.row_no DESC LIMIT 1",
+                (*params, str(asset_id)),
+            )
+            .fetchone()
+        )
+        return (row[1], json.loads(row[2])) if row else None
+
+    def find_by_name(
+        self, text: str, files: Sequence[str], require_url: bool = True
+    ) -> Optional[Tuple[str, Dict]]:
+        """First (file order, row order) asset with an id whose lowercase name contains `text`."""
+        self.sync()
+        position, params = self._file_position(files)
+        url_filter = "AND a.url != '' " if require_url else ""
+        row = (
+            self._conn()
+            .execute(
+                f"SELECT {position} AS pos, a.source_file, a.payload FROM assets a "
+                "WHERE instr(a.name_lower, ?) > 0 AND a.asset_id IS NOT NULL "
+                f"AND pos IS NOT NULL {url_filter}"
+                "ORDER BY pos, a.row_no LIMIT 1",
+                (*params, str(text).lower()),
+            )
+            .fetchone()
+        )
+        return (row[1], json.loads(row[2])) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        self.sync()
+        conn = self._conn()
+        files = {
+            name: {"rows": rows, "sha256": sha}
+            for name, rows, sha in conn.execute(
+                "SELECT name, rows, sha256 FROM files ORDER BY name"
+            )
+        }
+        return {
+            "db_path": self.db_path,
+            "files": files,
+            "rows": sum(f["rows"] for f in files.values()),
+        }
+
+
+_CATALOGS: Dict[str, AssetCatalog] = {}
+
+
+def get_asset_catalog(data_dir: str) -> AssetCatalog:
+    """进程内共享的目录数据库；无法打开或缺少 FTS5 时抛出 InfraError。"""
+    data_dir = os.path.abspath(data_dir)
+    catalog = _CATALOGS.get(data_dir)
+    if catalog is None:
+        catalog = _CATALOGS[data_dir] = AssetCatalog(data_dir)
+    return catalog
@@ -0,0 +1,291 @@
+"""
+Persisted inverted index over the asset catalog CSVs in `data/`.
+
+Every catalog row is stored once together with its lowercase search text (the same blob
+`asset_search` scores against), and each character unigram/bigram of that text maps to the
+set of row ids containing it. A substring test `term in blob` can then only succeed on rows in
+the intersection of the term's bigram postings, so a query touches a handful of candidate rows
+instead of re-parsing and scanning every CSV.
+
+For ranked search the index also stores BM25F term weights: catalog text is tokenized into
+word tokens for Latin/digit runs and character bigrams (plus unigrams) for CJK runs, and the
+per-row weight of every token over the identifier / description / category fields is computed
+at build time, so a query only sums a few precomputed postings.
+
+The index is pickled under `<cache_dir>/asset_index/` and rebuilt whenever the name, size or
+mtime of any CSV in the data directory changes.
+"""
+
+import csv
+import hashlib
+import math
+import os
+import pickle
+import re
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from utils.probe_cache import default_cache_dir
+
+# Row columns concatenated (in this order) into the search text of a row.
+SEARCH_FIELDS = ("identifier", "description", "category", "title", "name")
+
+# BM25F field groups: field name -> (CSV columns, weight).
+RANK_FIELDS = {
+    "identifier": (("identifier", "title", "name", "name_hint", "speaker_id"), 3.0),
+    "description": (("description",), 1.0),
+    "category": (("category", "categories", "type"), 0.5),
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+_FORMAT_VERSION = 2
+
+_TOKEN_RE = re.compile(
+    r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+
+_LOADED: Dict[str, "AssetIndex"] = {}
+
+
+def iter_catalog_rows(filepath: str) -> Iterator[Dict[str, str]]:
+    """Rows of a catalog CSV as dicts; leading `#` comment lines are skipped."""
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        lines = [line for line in f if not line.startswith("#")]
+    if not lines:
+        return
+    yield from csv.DictReader(lines)
+
+
+def row_search_text(row: Dict[str, str]) -> str:
+    return " ".join(row.get(field) or "" for field in SEARCH_FIELDS).lower()
+
+
+def catalog_signature(data_dir: str) -> Signature:
+    """(name, size, mtime_ns) of every CSV in `data_dir`, sorted by name."""
+    entries = []
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".csv") and entry.is_file():
+                st = entry.stat()
+                entries.append((entry.name, st.st_size, st.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """
+    Latin/digit runs become word tokens, CJK runs character bigrams:
+    "_90s画质" -> ["90s", "画质"], "复古打字机" -> ["复古", "古打", "打字", "字机"].
+    A one-character CJK run yields that character; `unigrams=True` (used for the index) adds
+    every CJK character as well, so single-character queries still match longer runs.
+    """
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if run[0] < "\u3040":
+            tokens.append(run)
+            continue
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        if unigrams:
+            tokens.extend(run)
+    return tokens
+
+
+def _bm25_weights(field_tokens: List[Dict[str, List[str]]]) -> Dict[str, Dict[int, float]]:
+    """BM25F: per-field length-normalized, weighted tf summed before saturation."""
+    total = len(field_tokens)
+    avg_len = {
+        field: (sum(len(row[field]) for row in field_tokens) / total if total else 0.0) or 1.0
+        for field in RANK_FIELDS
+    }
+    row_tf: List[Dict[str, float]] = []
+    doc_freq: Dict[str, int] = {}
+    for row in field_tokens:
+        tf: Dict[str, float] = {}
+        for field, (_, weight) in RANK_FIELDS.items():
+            tokens = row[field]
+            norm = weight / (1 - BM25_B + BM25_B * len(tokens) / avg_len[field])
+            for token in tokens:
+                tf[token] = tf.get(token, 0.0) + norm
+        row_tf.append(tf)
+        for token in tf:
+            doc_freq[token] = doc_freq.get(token, 0) + 1
+
+    weights: Dict[str, Dict[int, float]] = {}
+    for row_id, tf in enumerate(row_tf):
+        for token, value in tf.items():
+            df = doc_freq[token]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            saturated = value * (BM25_K1 + 1) / (BM25_K1 + value)
+            weights.setdefault(token, {})[row_id] = idf * saturated
+    return weights
+
+
+def _grams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i : i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class AssetIndex:
+    """
+    Row store plus n-gram inverted index of one catalog directory.
+
+    `rows[i]` is the parsed CSV row, `blobs[i]` its search text and `sources[i]` the CSV file
+    name. `candidates(text)` returns a superset of the row ids whose blob contains `text`;
+    `terms[token]` maps row ids to the BM25F weight of `token` in that row.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        signature: Signature,
+        rows: List[Dict[str, str]],
+        blobs: List[str],
+        sources: List[str],
+        postings: Dict[str, FrozenSet[int]],
+        terms: Dict[str, Dict[int, float]],
+    ):
+        self.data_dir = data_dir
+        self.signature = signature
+        self.rows = rows
+        self.blobs = blobs
+        self.sources = sources
+        self.postings = postings
+        self.terms = terms
+        self._all = frozenset(range(len(rows)))
+
+    @classmethod
+    def build(cls, data_dir: str, signature: Optional[Signature] = None) -> "AssetIndex":
+        data_dir = os.path.abspath(data_dir)
+        if signature is None:
+            signature = catalog_signature(data_dir)
+        rows: List[Dict[str, str]] = []
+        blobs: List[str] = []
+        sources: List[str] = []
+        postings: Dict[str, set] = {}
+        field_tokens: List[Dict[str, List[str]]] = []
+        for name, _, _ in signature:
+            for row in iter_catalog_rows(os.path.join(data_dir, name)):
+                row_id = len(rows)
+                blob = row_search_text(row)
+                rows.append(row)
+                blobs.append(blob)
+                sources.append(name)
+                for gram in _grams(blob):
+                    postings.setdefault(gram, set()).add(row_id)
+                field_tokens.append(
+                    {
+                        field: tokenize(" ".join(row.get(c) or "" for c in columns), True)
+                        for field, (columns, _) in RANK_FIELDS.items()
+                    }
+                )
+        frozen = {gram: frozenset(ids) for gram, ids in postings.items()}
+        terms = _bm25_weights(field_tokens)
+        return cls(data_dir, signature, rows, blobs, sources, frozen, terms)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def candidates(self, text: str) -> FrozenSet[int]:
+        """Row ids that may contain `text` (every row containing it is included)."""
+        if not text:
+            return self._all
+        if len(text) == 1:
+            return self.postings.get(text, frozenset())
+        lists = []
+        for gram in {text[i : i + 2] for i in range(len(text) - 1)}:
+            ids = self.postings.get(gram)
+            if not ids:
+                return frozenset()
+            lists.append(ids)
+        lists.sort(key=len)
+        result = lists[0]
+        for ids in lists[1:]:
+            result = result & ids
+            if not result:
+                break
+        return result
+
+    def bm25_scores(self, weighted_tokens: Dict[str, float]) -> Dict[int, float]:
+        """Sum of query-weighted BM25F token weights per matching row."""
+        scores: Dict[int, float] = {}
+        for token, query_weight in weighted_tokens.items():
+            for row_id, weight in self.terms.get(token, {}).items():
+                scores[row_id] = scores.get(row_id, 0.0) + query_weight * weight
+        return scores
+
+    def save(self, path: str) -> None:
+        """Pickle the index atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "version": _FORMAT_VERSION,
+            "data_dir": self.data_dir,
+            "signature": self.signature,
+            "rows": self.rows,
+            "blobs": self.blobs,
+            "sources": self.sources,
+            "postings": self.postings,
+            "terms": self.terms,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, signature: Signature) -> Optional["AssetIndex"]:
+        """Load a pickled index; None if missing, unreadable or built from other CSVs."""
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if (
+            not isinstance(payload, dict)
+            or payload.get("version") != _FORMAT_VERSION
+            or payload.get("signature") != signature
+        ):
+            return None
+        return cls(
+            payload["data_dir"],
+            signature,
+            payload["rows"],
+            payload["blobs"],
+            payload["sources"],
+            payload["postings"],
+            payload["terms"],
+        )
+
+
+def default_index_path(data_dir: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(data_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(default_cache_dir(), "asset_index", f"{digest}.pickle")
+
+
+def load_asset_index(
+    data_dir: str, cache_path: Optional[str] = None, rebuild: bool = False
+) -> AssetIndex:
+    """
+    当前进程内复用的目录索引：CSV 未变化时直接返回内存中的索引，
+    否则依次尝试磁盘上的索引文件和完整重建（重建结果会写回磁盘，写入失败不影响查询）。
+    """
+    data_dir = os.path.abspath(data_dir)
+    signature = catalog_signature(data_dir)
+    index = _LOADED.get(data_dir)
+    if index is not None and index.signature == signature and not rebuild:
+        return index
+
+    path = cache_path or default_index_path(data_dir)
+    index = None if rebuild else AssetIndex.load(path, signature)
+    if index is None:
+        index = AssetIndex.build(data_dir, signature)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"⚠️ Asset index not persisted ({path}): {e}")
+    _LOADED[data_dir] = index
+    return index
@@ -8,6 +8,14 @@ class RuntimeConfig:
     cloud_max_mb: float
     tts_insecure_ssl: bool
     projects_root_override: str
+    draft_format: str
+    cache_dir: str
+    probe_cache_max: int
+    normalize_workers: int
+    normalize_timeout_s: float
+    normalize_cache_mb: float
+    asset_backend: str
+    daemon_mode: str
 
 
 def load_config() -> RuntimeConfig:
@@ -16,6 +24,14 @@ def load_config() -> RuntimeConfig:
         cloud_max_mb=float(os.getenv("JY_CLOUD_MAX_MB", "512")),
         tts_insecure_ssl=os.getenv("JY_TTS_INSECURE_SSL", "0") == "1",
         projects_root_override=os.getenv("JY_PROJECTS_ROOT", "").strip(),
+        draft_format=os.getenv("JY_DRAFT_FORMAT", "pretty").strip().lower() or "pretty",
+        cache_dir=os.getenv("JY_CACHE_DIR", "").strip(),
+        probe_cache_max=int(os.getenv("JY_PROBE_CACHE_MAX", "20000")),
+        normalize_workers=int(os.getenv("JY_NORMALIZE_WORKERS", "2")),
+        normalize_timeout_s=float(os.getenv("JY_NORMALIZE_TIMEOUT", "600")),
+        normalize_cache_mb=float(os.getenv("JY_NORMALIZE_CACHE_MB", "4096")),
+        asset_backend=os.getenv("JY_ASSET_BACKEND", "index").strip().lower() or "index",
+        daemon_mode=os.getenv("JY_DAEMON", "auto").strip().lower() or "auto",
     )
 
 
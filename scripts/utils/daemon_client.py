@@ -0,0 +1,122 @@
+"""
+Client side of the resident daemon (`scripts/jy_daemon.py`).
+
+The daemon writes a small state file (`<cache_dir>/jy_daemon.json`) describing how to reach
+it: a Unix domain socket, or on platforms without AF_UNIX a 127.0.0.1 TCP port plus a random
+token. Requests are newline-delimited JSON-RPC 2.0 objects, one response line per request.
+
+CLIs call `try_daemon(method, **params)`: when the daemon is running they get its answer,
+otherwise (not started, stale state file, JY_DAEMON=off, any transport or RPC error) they
+run the work locally as before.
+"""
+
+import itertools
+import json
+import os
+import socket
+from typing import Any, Dict, Optional, Tuple
+
+from utils.config import CONFIG
+from utils.errors import InfraError, JyError
+from utils.probe_cache import default_cache_dir
+
+CONNECT_TIMEOUT_S = 0.5
+CALL_TIMEOUT_S = 300.0
+
+_ids = itertools.count(1)
+
+
+class DaemonError(JyError):
+    """JSON-RPC error returned by the daemon."""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+def default_state_path() -> str:
+    return os.path.join(default_cache_dir(), "jy_daemon.json")
+
+
+def default_socket_path() -> str:
+    return os.path.join(default_cache_dir(), "jy_daemon.sock")
+
+
+def read_state(state_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    try:
+        with open(state_path or default_state_path(), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) and state.get("transport") else None
+
+
+class DaemonClient:
+    """One connection per call; `call()` raises InfraError (transport) or DaemonError (RPC)."""
+
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+
+    def _connect(self) -> socket.socket:
+        if self.state["transport"] == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address: Any = self.state["path"]
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (self.state["host"], int(self.state["port"]))
+        sock.settimeout(CONNECT_TIMEOUT_S)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(CALL_TIMEOUT_S)
+        return sock
+
+    def call(self, method: str, **params: Any) -> Any:
+        request = {"jsonrpc": "2.0", "id": next(_ids), "method": method, "params": params}
+        if self.state.get("token"):
+            request["auth"] = self.state["token"]
+        try:
+            with self._connect() as sock:
+                sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise InfraError(f"Daemon unreachable: {e}") from e
+        if not line:
+            raise InfraError("Daemon closed the connection without a response")
+        try:
+            response = json.loads(line)
+        except ValueError as e:
+            raise InfraError(f"Malformed daemon response: {e}") from e
+        error = response.get("error")
+        if error:
+            raise DaemonError(
+                error.get("code", -32000), error.get("message", ""), error.get("data")
+            )
+        return response.get("result")
+
+
+def get_daemon_client(state_path: Optional[str] = None) -> Optional[DaemonClient]:
+    """Client for the running daemon, or None if it is disabled or no state file exists."""
+    if CONFIG.daemon_mode == "off":
+        return None
+    state = read_state(state_path)
+    if state is None:
+        return None
+    if state["transport"] == "unix" and not hasattr(socket, "AF_UNIX"):
+        return None
+    return DaemonClient(state)
+
+
+def try_daemon(method: str, **params: Any) -> Tuple[bool, Any]:
+    """(True, result) if the daemon answered, (False, None) if the caller should run locally."""
+    client = get_daemon_client()
+    if client is None:
+        return False, None
+    try:
+        return True, client.call(method, **params)
+    except JyError:
+        return False, None
@@ -2,7 +2,6 @@ import difflib
 import functools
 import os
 import re
-import subprocess
 from typing import Dict, List, Union
 
 
@@ -137,31 +136,17 @@ def format_srt_time(us: int) -> str:
 def get_duration_ffprobe_cached(file_path: str) -> float:
     """
     带缓存的 ffprobe 时长检测，防止重复开销。
+    先尝试直接读取容器头（utils.media_headers），读不出时才用 utils.media_probe 的一次性 JSON 探测，
+    与其它元数据共用跨进程磁盘缓存。
     """
-    file_path = os.path.abspath(file_path)
-    if not os.path.exists(file_path):
-        return 0.0
-    try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                file_path,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=5,
-        )
-        return float(result.stdout.strip())
-    except Exception as e:
-        print(f"⚠️ ffprobe failed for {os.path.basename(file_path)}: {e}")
-        return 0.0
+    from utils.media_headers import read_media_header
+    from utils.media_probe import probe_media_file
+
+    header = read_media_header(file_path)
+    if header and header["duration"]:
+        return header["duration"] / 1000000
+    probe = probe_media_file(file_path)
+    return probe.duration if probe else 0.0
 
 
 # ----------------- Enum 模糊匹配 -----------------
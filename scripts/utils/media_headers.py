@@ -0,0 +1,284 @@
+"""
+Pure-Python container header readers (fast path before MediaInfo / ffprobe).
+
+Each reader maps the file read-only and parses only the few header fields needed for the
+duration and, for MP4/MOV, the video dimensions; nothing is decoded. A reader returns None
+whenever the file is not a shape it fully understands (fragmented MP4, RF64, free-format MP3,
+...), and the caller falls back to the full probe.
+
+`read_media_header(path)` returns the same record layout as
+`pyJianYingDraft.local_materials.probe_media` (durations in microseconds).
+"""
+
+import mmap
+import os
+import struct
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+Record = Dict[str, Any]
+
+# ----------------- MP4 / MOV -----------------
+
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia"}
+
+
+def _iter_boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, box_end) of the boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find_box(buf, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for k, payload, box_end in _iter_boxes(buf, start, end):
+        if k == kind:
+            return payload, box_end
+    return None
+
+
+def _timescaled_duration(buf, payload: int) -> Optional[int]:
+    """mvhd/mdhd -> duration in microseconds."""
+    version = buf[payload]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, payload + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, payload + 12)
+    if not timescale or not duration or duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return None
+    return duration * 1000000 // timescale
+
+
+def _read_mp4(buf) -> Optional[Record]:
+    moov = _find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        return None
+    mvhd = _find_box(buf, moov[0], moov[1], b"mvhd")
+    movie_duration = _timescaled_duration(buf, mvhd[0]) if mvhd else None
+
+    video = audio = None
+    for kind, payload, box_end in _iter_boxes(buf, moov[0], moov[1]):
+        if kind != b"trak":
+            continue
+        tkhd = _find_box(buf, payload, box_end, b"tkhd")
+        mdia = _find_box(buf, payload, box_end, b"mdia")
+        if tkhd is None or mdia is None:
+            continue
+        hdlr = _find_box(buf, mdia[0], mdia[1], b"hdlr")
+        mdhd = _find_box(buf, mdia[0], mdia[1], b"mdhd")
+        if hdlr is None:
+            continue
+        handler = bytes(buf[hdlr[0] + 8 : hdlr[0] + 12])
+        duration = (_timescaled_duration(buf, mdhd[0]) if mdhd else None) or movie_duration
+        if handler == b"vide" and video is None:
+            # tkhd ends with width/height as 16.16 fixed point
+            width, height = struct.unpack_from(">II", buf, tkhd[1] - 8)
+            video = (duration, width >> 16, height >> 16)
+        elif handler == b"soun" and audio is None:
+            audio = duration
+
+    if video is not None:
+        duration, width, height = video
+        if not duration or not width or not height:
+            return None
+        return {
+            "material_type": "video",
+            "duration": duration,
+            "width": width,
+            "height": height,
+            "has_video": True,
+            "has_audio": audio is not None,
+            "audio_duration": audio,
+        }
+    if audio:
+        return _audio_record(audio)
+    return None
+
+
+# ----------------- WAV -----------------
+
+
+def _read_wav(buf) -> Optional[Record]:
+    if buf[0:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        return None
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(buf):
+        kind, size = struct.unpack_from("<4sI", buf, pos)
+        if kind == b"fmt " and size >= 16:
+            byte_rate = struct.unpack_from("<I", buf, pos + 16)[0]
+        elif kind == b"data":
+            if not byte_rate:
+                return None
+            # Streaming writers leave 0 / 0xFFFFFFFF; the data then runs to the end of the file.
+            if size in (0, 0xFFFFFFFF) or pos + 8 + size > len(buf):
+                size = len(buf) - pos - 8
+            return _audio_record(size * 1000000 // byte_rate)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+# ----------------- Ogg (Opus / Vorbis) -----------------
+
+
+def _read_ogg(buf) -> Optional[Record]:
+    if buf[0:4] != b"OggS" or len(buf) < 28:
+        return None
+    serial = struct.unpack_from("<I", buf, 14)[0]
+    packet = 27 + buf[26]
+    if buf[packet : packet + 8] == b"OpusHead":
+        pre_skip = struct.unpack_from("<H", buf, packet + 10)[0]
+        rate = 48000  # Opus granule positions always count 48 kHz samples
+    elif buf[packet : packet + 7] == b"\x01vorbis":
+        pre_skip = 0
+        rate = struct.unpack_from("<I", buf, packet + 12)[0]
+    else:
+        return None
+    if not rate:
+        return None
+
+    # Last page of this logical stream carries the total sample count as its granule position.
+    pos = buf.rfind(b"OggS", max(0, len(buf) - 65536 - 27))
+    while pos >= 0:
+        if pos + 27 <= len(buf) and struct.unpack_from("<I", buf, pos + 14)[0] == serial:
+            granule = struct.unpack_from("<q", buf, pos + 6)[0]
+            if granule > pre_skip:
+                return _audio_record((granule - pre_skip) * 1000000 // rate)
+        pos = buf.rfind(b"OggS", max(0, pos - 65536 - 27), pos)
+    return None
+
+
+# ----------------- MP3 -----------------
+
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+_MP3_VERSIONS = {0b11: 1, 0b10: 2, 0b00: 2.5}
+
+
+def _mp3_frame(buf, pos: int) -> Optional[Tuple[Any, int, int, int, bool]]:
+    """Parse a Layer III frame header -> (version, bitrate_kbps, sample_rate, frame_len, mono)."""
+    if pos + 4 > len(buf) or buf[pos] != 0xFF or buf[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = buf[pos + 1], buf[pos + 2], buf[pos + 3]
+    version = _MP3_VERSIONS.get((b1 >> 3) & 0b11)
+    if version is None or (b1 >> 1) & 0b11 != 0b01:  # Layer III only
+        return None
+    bitrate_idx, rate_idx = b2 >> 4, (b2 >> 2) & 0b11
+    if bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    bitrate = _MP3_BITRATES[1 if version == 1 else 2][bitrate_idx]
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+    coeff = 144 if version == 1 else 72
+    frame_len = coeff * bitrate * 1000 // sample_rate + ((b2 >> 1) & 1)
+    return version, bitrate, sample_rate, frame_len, (b3 >> 6) == 0b11
+
+
+def _read_mp3(buf) -> Optional[Record]:
+    pos = 0
+    if buf[0:3] == b"ID3" and len(buf) >= 10:
+        size = 0
+        for b in buf[6:10]:
+            size = (size << 7) | (b & 0x7F)
+        pos = 10 + size + (10 if buf[5] & 0x10 else 0)
+
+    # Find the first frame whose successor also parses (guards against false syncs).
+    limit = min(len(buf), pos + 65536)
+    frame = None
+    while pos < limit:
+        pos = buf.find(b"\xff", pos, limit)
+        if pos < 0:
+            return None
+        frame = _mp3_frame(buf, pos)
+        if frame and (pos + frame[3] >= len(buf) or _mp3_frame(buf, pos + frame[3])):
+            break
+        frame = None
+        pos += 1
+    if frame is None:
+        return None
+
+    version, bitrate, sample_rate, _, mono = frame
+    samples_per_frame = 1152 if version == 1 else 576
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    if buf[xing : xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", buf, xing + 4)[0]
+        if flags & 0x1:
+            frames = struct.unpack_from(">I", buf, xing + 8)[0]
+            return _audio_record(frames * samples_per_frame * 1000000 // sample_rate)
+    vbri = pos + 4 + 32
+    if buf[vbri : vbri + 4] == b"VBRI":
+        frames = struct.unpack_from(">I", buf, vbri + 14)[0]
+        return _audio_record(frames * samples_per_frame * 1000000 // sample_rate)
+
+    # CBR estimate from the audio payload size
+    end = len(buf) - (128 if buf[-128:-125] == b"TAG" else 0)
+    return _audio_record((end - pos) * 8 * 1000 // bitrate)
+
+
+# ----------------- Dispatcher -----------------
+
+
+def _audio_record(duration_us: int) -> Optional[Record]:
+    if duration_us <= 0:
+        return None
+    return {
+        "material_type": "audio",
+        "duration": duration_us,
+        "width": None,
+        "height": None,
+        "has_video": False,
+        "has_audio": True,
+        "audio_duration": duration_us,
+    }
+
+
+_READERS: Dict[str, Callable[[Any], Optional[Record]]] = {
+    ".mp4": _read_mp4,
+    ".mov": _read_mp4,
+    ".m4v": _read_mp4,
+    ".m4a": _read_mp4,
+    ".wav": _read_wav,
+    ".ogg": _read_ogg,
+    ".opus": _read_ogg,
+    ".mp3": _read_mp3,
+}
+
+
+def read_media_header(path: str) -> Optional[Record]:
+    """Duration (and MP4/MOV video size) from container headers, or None if unsupported."""
+    reader = _READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 12:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return reader(buf)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+
+
+def install_header_probe() -> None:
+    """Let pyJianYingDraft's VideoMaterial/AudioMaterial try the header readers before MediaInfo."""
+    from pyJianYingDraft import local_materials
+
+    local_materials.set_fast_probe(read_media_header)
@@ -1,42 +1,254 @@
+import hashlib
 import os
+import shutil
+import sqlite3
 import subprocess
-from typing import Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+from utils.config import CONFIG
+from utils.media_probe import MediaProbe, probe_media_file
+from utils.probe_cache import default_cache_dir
 
-def _norm_output_path(input_path: str) -> str:
-    abs_in = os.path.abspath(input_path)
-    parent = os.path.dirname(abs_in)
-    stem, _ = os.path.splitext(os.path.basename(abs_in))
-    cache_dir = os.path.join(parent, "__jycache__")
-    os.makedirs(cache_dir, exist_ok=True)
-    return os.path.join(cache_dir, f"{stem}.__jy_norm__.mp4")
+# Streams JianYing imports reliably from MP4 and that can therefore be copied instead of encoded.
+_COPY_VIDEO_CODECS = {"h264"}
+_COPY_PIX_FMTS = {"yuv420p", "yuvj420p"}
+_COPY_AUDIO_CODECS = {"aac", "mp3"}
 
+_X264_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast", "-crf", "18"]
+_AAC_ARGS = ["-c:a", "aac", "-b:a", "192k"]
 
-def _is_cache_fresh(src: str, dst: str) -> bool:
-    if not os.path.exists(dst):
-        return False
-    try:
-        return os.path.getmtime(dst) >= os.path.getmtime(src)
-    except OSError:
-        return False
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    encode_ms INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_last_used ON outputs (last_used);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
 
 
-def normalize_webm_for_jianying(input_path: str) -> Optional[str]:
+class NormalizationCache:
     """
-    Convert WEBM to JianYing-friendly MP4 before timeline import.
+    Global, content-addressed store of normalized MP4s: <root>/<sha256 of source>.mp4.
 
-    Output profile:
-    - Video: H.264 (libx264), yuv420p
-    - Audio: AAC (optional if source has audio)
+    Identical sources in different folders share one encode. Drafts never reference these
+    files directly (see `_publish`), so evicting one cannot break a saved draft. A SQLite index (WAL, one
+    connection per thread) keeps the output sizes for LRU eviction beyond `max_bytes`, memoizes
+    source hashes by (path, size, mtime_ns) so unchanged files are hashed once, and counts hits,
+    remuxes and transcodes for `stats()`.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self.root, "index.sqlite"), timeout=10.0, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_CACHE_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def output_path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.mp4")
+
+    def temp_path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.{os.getpid()}.{threading.get_ident()}.part.mp4")
+
+    def source_digest(self, src: str) -> str:
+        """sha256 of the file content, memoized while the file's size and mtime are unchanged."""
+        st = os.stat(src)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT digest FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (src, st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0]
+        with open(src, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        conn.execute(
+            "INSERT OR REPLACE INTO sources (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+            (src, st.st_size, st.st_mtime_ns, digest),
+        )
+        return digest
+
+    def _bump(self, conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """Cached output for `digest` (counted as a hit), or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT size, encode_ms FROM outputs WHERE digest = ?", (digest,)
+        ).fetchone()
+        path = self.output_path(digest)
+        if row is None or not os.path.exists(path):
+            if row is not None:
+                conn.execute("DELETE FROM outputs WHERE digest = ?", (digest,))
+            return None
+        conn.execute("UPDATE outputs SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        self._bump(conn, "hits")
+        self._bump(conn, "bytes_saved", row[0])
+        self._bump(conn, "encode_ms_saved", row[1])
+        return path
+
+    def store(self, digest: str, tmp_path: str, mode: str, encode_ms: int) -> str:
+        """Move a finished ffmpeg output into the cache ("remux" or "transcode") and evict."""
+        path = self.output_path(digest)
+        os.replace(tmp_path, path)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO outputs (digest, size, mode, encode_ms, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (digest, os.path.getsize(path), mode, encode_ms, time.time()),
+        )
+        self._bump(conn, "remuxes" if mode == "remux" else "transcodes")
+        self.evict(keep=digest)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used outputs until the total size fits `max_bytes`."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM outputs").fetchone()[0]
+        removed = 0
+        if total <= self.max_bytes:
+            return 0
+        for digest, size in conn.execute(
+            "SELECT digest, size FROM outputs ORDER BY last_used ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            _remove_quietly(self.output_path(digest))
+            conn.execute("DELETE FROM outputs WHERE digest = ?", (digest,))
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count/bytes plus hits, remuxes and transcodes; transcodes_avoided = both former."""
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs"
+        ).fetchone()
+        data = {
+            name: counters.get(name, 0)
+            for name in ("hits", "remuxes", "transcodes", "bytes_saved", "encode_ms_saved")
+        }
+        data.update(
+            entries=entries,
+            cache_bytes=total,
+            max_bytes=self.max_bytes,
+            transcodes_avoided=data["hits"] + data["remuxes"],
+        )
+        return data
+
+
+_DEFAULT_CACHE: Optional[NormalizationCache] = None
+_DEFAULT_CACHE_LOCK = threading.Lock()
+
+
+def get_normalization_cache() -> NormalizationCache:
+    """Process-wide cache in <cache_dir>/normalized, bounded by JY_NORMALIZE_CACHE_MB."""
+    global _DEFAULT_CACHE
+    with _DEFAULT_CACHE_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = NormalizationCache(
+                os.path.join(default_cache_dir(), "normalized"),
+                int(CONFIG.normalize_cache_mb * 1024 * 1024),
+            )
+        return _DEFAULT_CACHE
+
+
+def draft_output_path(input_path: str) -> str:
+    """Per-folder path drafts reference: <source dir>/__jycache__/<stem>.__jy_norm__.mp4."""
+    src = os.path.abspath(input_path)
+    stem, _ = os.path.splitext(os.path.basename(src))
+    return os.path.join(os.path.dirname(src), "__jycache__", f"{stem}.__jy_norm__.mp4")
+
+
+def _publish(src: str, cached: str) -> str:
+    """
+    Hardlink (or copy, across filesystems) a cached output next to its source and return that
+    path. Drafts reference the per-folder file, so LRU eviction of the global cache only drops
+    the cache's own link and never breaks a saved draft. Falls back to the cache path when the
+    source folder is not writable.
     """
+    dst = draft_output_path(src)
+    try:
+        if (
+            os.path.exists(dst)
+            and os.path.getsize(dst) == os.path.getsize(cached)
+            and os.path.getmtime(dst) >= os.path.getmtime(src)
+        ):
+            return dst
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(cached, tmp)
+        except OSError:
+            shutil.copyfile(cached, tmp)
+        os.replace(tmp, dst)
+        return dst
+    except OSError as e:
+        print(f"⚠️ Normalized MP4 not published next to {src} ({e}); using the cache path.")
+        return cached
+
+
+def fresh_normalized_path(input_path: str) -> Optional[str]:
+    """Normalized MP4 for the content of `input_path` if already cached, else None."""
     src = os.path.abspath(input_path)
     if not os.path.exists(src):
         return None
+    cache = get_normalization_cache()
+    cached = cache.lookup(cache.source_digest(src))
+    return _publish(src, cached) if cached else None
 
-    dst = _norm_output_path(src)
-    if _is_cache_fresh(src, dst):
-        return dst
 
+def _codec_args(probe: Optional[MediaProbe]) -> Tuple[List[str], str]:
+    """ffmpeg stream args and mode: copy MP4-friendly streams, encode the rest."""
+    if probe is None:
+        return ["-map", "0:a?", *_X264_ARGS, *_AAC_ARGS], "transcode"
+    copy_video = probe.video_codec in _COPY_VIDEO_CODECS and probe.pix_fmt in _COPY_PIX_FMTS
+    args = ["-c:v", "copy"] if copy_video else list(_X264_ARGS)
+    if not probe.has_audio:
+        args += ["-an"]
+    elif probe.audio_codec in _COPY_AUDIO_CODECS:
+        args += ["-map", "0:a?", "-c:a", "copy"]
+    else:
+        args += ["-map", "0:a?", *_AAC_ARGS]
+    return args, "remux" if copy_video else "transcode"
+
+
+def _run_ffmpeg(src: str, stream_args: List[str], dst: str, timeout: Optional[float]) -> bool:
     cmd = [
         "ffmpeg",
         "-hide_banner",
@@ -47,37 +259,141 @@ def normalize_webm_for_jianying(input_path: str) -> Optional[str]:
         src,
         "-map",
         "0:v:0",
-        "-map",
-        "0:a?",
-        "-c:v",
-        "libx264",
-        "-pix_fmt",
-        "yuv420p",
-        "-preset",
-        "veryfast",
-        "-crf",
-        "18",
-        "-c:a",
-        "aac",
-        "-b:a",
-        "192k",
+        *stream_args,
         "-movflags",
         "+faststart",
         dst,
     ]
-
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        proc = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout
+        )
     except FileNotFoundError:
         print("❌ FFmpeg not found. Cannot normalize WEBM for JianYing import.")
-        return None
+        return False
+    except subprocess.TimeoutExpired:
+        print(f"❌ WEBM normalization timed out after {timeout}s: {src}")
+        _remove_quietly(dst)
+        return False
     except Exception as e:
         print(f"❌ WEBM normalization failed: {e}")
-        return None
+        _remove_quietly(dst)
+        return False
 
     if proc.returncode != 0 or not os.path.exists(dst):
         err = (proc.stderr or proc.stdout or "").strip()
         print(f"❌ WEBM normalization failed (ffmpeg={proc.returncode}): {err}")
+        _remove_quietly(dst)
+        return False
+    return True
+
+
+def normalize_webm_for_jianying(input_path: str, timeout: Optional[float] = None) -> Optional[str]:
+    """
+    Convert WEBM to JianYing-friendly MP4 before timeline import.
+
+    Output profile:
+    - Video: H.264 yuv420p, stream-copied when the source already is, else libx264
+    - Audio: AAC/MP3 copied, other codecs encoded to AAC, dropped when the source has none
+
+    Outputs live in the global content-hash cache (`get_normalization_cache()`), so the same
+    file is converted once no matter which folder it sits in. ffmpeg writes to a temp file that
+    is moved into the cache on success, so a killed or timed-out run (`timeout` seconds) never
+    leaves a half-written MP4 behind. The returned path is a hardlink (or copy) of the cached
+    output in `<source dir>/__jycache__/`, which cache eviction never deletes.
+    """
+    src = os.path.abspath(input_path)
+    if not os.path.exists(src):
         return None
 
-    return dst
+    cache = get_normalization_cache()
+    digest = cache.source_digest(src)
+    cached = cache.lookup(digest)
+    if cached:
+        return _publish(src, cached)
+
+    # 一次 ffprobe 决定转码方式：没有视频流直接放弃；编码兼容时只换封装(-c copy)
+    probe = probe_media_file(src)
+    if probe is not None and not probe.has_video:
+        print(f"❌ WEBM has no video stream: {src}")
+        return None
+    stream_args, mode = _codec_args(probe)
+
+    tmp = cache.temp_path(digest)
+    started = time.perf_counter()
+    ok = _run_ffmpeg(src, stream_args, tmp, timeout)
+    if not ok and mode == "remux":
+        # 个别文件时间戳等问题导致无法直接封装时退回完整转码
+        stream_args, mode = _codec_args(None)
+        ok = _run_ffmpeg(src, stream_args, tmp, timeout)
+    if not ok:
+        return None
+    stored = cache.store(digest, tmp, mode, int((time.perf_counter() - started) * 1000))
+    return _publish(src, stored)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class NormalizationPool:
+    """
+    Bounded background pool for WEBM -> MP4 normalization.
+
+    `submit()` returns immediately with a Future resolving to the normalized path (None on
+    failure or timeout); submitting the same source again shares its job unless that job
+    failed, in which case it is retried. Workers start lazily on the first submit.
+    Concurrency and the per-job ffmpeg timeout default to JY_NORMALIZE_WORKERS /
+    JY_NORMALIZE_TIMEOUT.
+    """
+
+    def __init__(self, workers: int = None, timeout: Optional[float] = None):
+        self.workers = max(1, workers or CONFIG.normalize_workers)
+        self.timeout = timeout if timeout is not None else CONFIG.normalize_timeout_s
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, input_path: str) -> Future:
+        src = os.path.abspath(input_path)
+        with self._lock:
+            job = self._jobs.get(src)
+            if job is None or (job.done() and (job.exception() or job.result() is None)):
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="jy-normalize"
+                    )
+                job = self._executor.submit(self._run, src)
+                self._jobs[src] = job
+            return job
+
+    def _run(self, src: str) -> Optional[str]:
+        return normalize_webm_for_jianying(src, timeout=self.timeout or None)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done())
+
+    def wait_all(self) -> Dict[str, Optional[str]]:
+        """Block until every submitted job finished; returns {source: normalized path or None}."""
+        with self._lock:
+            jobs = dict(self._jobs)
+        results = {}
+        for src, job in jobs.items():
+            try:
+                results[src] = job.result()
+            except Exception as e:
+                print(f"❌ WEBM normalization failed: {e}")
+                results[src] = None
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._jobs.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,187 @@
+import json
+import os
+import subprocess
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from utils.probe_cache import get_probe_cache
+
+
+@dataclass(frozen=True)
+class MediaProbe:
+    """Stream metadata of one media file from a single `ffprobe -show_streams -show_format` run."""
+
+    path: str
+    duration: float = 0.0
+    """Seconds; 0.0 when ffprobe reports none."""
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    pix_fmt: Optional[str] = None
+    rotation: int = 0
+    """Clockwise display rotation in degrees (0/90/180/270)."""
+    audio_streams: int = 0
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_streams > 0
+
+    @property
+    def display_size(self):
+        """(width, height) as displayed, i.e. swapped for 90/270 degree rotation."""
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_record(self) -> Dict[str, Any]:
+        """Row for utils.probe_cache (durations in microseconds)."""
+        kind = "video" if self.has_video else ("audio" if self.has_audio else None)
+        return {
+            "material_type": kind,
+            "duration": int(self.duration * 1000000),
+            "width": self.width,
+            "height": self.height,
+            "has_video": self.has_video,
+            "has_audio": self.has_audio,
+            "fps": self.fps,
+            "video_codec": self.video_codec,
+            "audio_codec": self.audio_codec,
+            "pix_fmt": self.pix_fmt,
+            "rotation": self.rotation,
+            "audio_streams": self.audio_streams,
+        }
+
+    @classmethod
+    def from_record(cls, path: str, record: Dict[str, Any]) -> "MediaProbe":
+        return cls(
+            path=path,
+            duration=(record["duration"] or 0) / 1000000,
+            width=record["width"] or 0,
+            height=record["height"] or 0,
+            fps=record["fps"] or 0.0,
+            video_codec=record["video_codec"],
+            audio_codec=record["audio_codec"],
+            pix_fmt=record["pix_fmt"],
+            rotation=record["rotation"] or 0,
+            audio_streams=record["audio_streams"] or 0,
+        )
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """'30000/1001' -> 29.97; '0/0' or missing -> 0.0."""
+    if not rate:
+        return 0.0
+    num, _, den = rate.partition("/")
+    den_f = _to_float(den) if den else 1.0
+    return round(_to_float(num) / den_f, 3) if den_f else 0.0
+
+
+def _stream_rotation(stream: Dict[str, Any]) -> int:
+    rotate = (stream.get("tags") or {}).get("rotate")
+    if rotate is None:
+        for side in stream.get("side_data_list") or []:
+            if "rotation" in side:
+                # Display matrix rotation is counter-clockwise (e.g. -90 for a portrait phone clip).
+                rotate = -_to_float(side["rotation"])
+                break
+    return int(_to_float(rotate)) % 360
+
+
+def parse_ffprobe_json(path: str, data: Dict[str, Any]) -> MediaProbe:
+    """Build a MediaProbe from `ffprobe -of json -show_streams -show_format` output."""
+    streams = data.get("streams") or []
+    fmt = data.get("format") or {}
+    # Cover art in audio files shows up as a video stream with the attached_pic disposition.
+    video = next(
+        (
+            s
+            for s in streams
+            if s.get("codec_type") == "video"
+            and not (s.get("disposition") or {}).get("attached_pic")
+        ),
+        None,
+    )
+    audios = [s for s in streams if s.get("codec_type") == "audio"]
+
+    duration = _to_float(fmt.get("duration"))
+    if not duration:
+        duration = max((_to_float(s.get("duration")) for s in streams), default=0.0)
+
+    if video is None:
+        return MediaProbe(
+            path=path,
+            duration=duration,
+            audio_codec=audios[0].get("codec_name") if audios else None,
+            audio_streams=len(audios),
+        )
+    return MediaProbe(
+        path=path,
+        duration=duration,
+        width=int(video.get("width") or 0),
+        height=int(video.get("height") or 0),
+        fps=_parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")),
+        video_codec=video.get("codec_name"),
+        audio_codec=audios[0].get("codec_name") if audios else None,
+        pix_fmt=video.get("pix_fmt"),
+        rotation=_stream_rotation(video),
+        audio_streams=len(audios),
+    )
+
+
+def probe_media_file(file_path: str, use_cache: bool = True) -> Optional[MediaProbe]:
+    """
+    一次 ffprobe 调用取得时长、帧率、编码、像素格式、尺寸、旋转和音轨数。
+    结果写入磁盘探测缓存（utils.probe_cache，按路径/大小/mtime 失效）；ffprobe 不可用或失败时返回 None。
+    """
+    file_path = os.path.abspath(file_path)
+    if not os.path.exists(file_path):
+        return None
+
+    cache = get_probe_cache() if use_cache else None
+    record = cache.get(file_path, "ffprobe") if cache is not None else None
+    if record is not None:
+        return MediaProbe.from_record(file_path, record)
+
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_streams",
+                "-show_format",
+                "-of",
+                "json",
+                file_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=15,
+        )
+        if result.returncode != 0:
+            raise RuntimeError((result.stderr or "").strip() or f"exit code {result.returncode}")
+        probe = parse_ffprobe_json(file_path, json.loads(result.stdout or "{}"))
+    except Exception as e:
+        print(f"⚠️ ffprobe failed for {os.path.basename(file_path)}: {e}")
+        return None
+
+    if cache is not None:
+        cache.put(file_path, "ffprobe", probe.to_record())
+    return probe
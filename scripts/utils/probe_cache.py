@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.config import CONFIG
+
+PROBE_FIELDS = (
+    "material_type",
+    "duration",
+    "width",
+    "height",
+    "has_video",
+    "has_audio",
+    "audio_duration",
+    # ffprobe-only fields (see utils.media_probe)
+    "fps",
+    "video_codec",
+    "audio_codec",
+    "pix_fmt",
+    "rotation",
+    "audio_streams",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    material_type TEXT,
+    duration INTEGER,
+    width INTEGER,
+    height INTEGER,
+    has_video INTEGER,
+    has_audio INTEGER,
+    audio_duration INTEGER,
+    fps REAL,
+    video_codec TEXT,
+    audio_codec TEXT,
+    pix_fmt TEXT,
+    rotation INTEGER,
+    audio_streams INTEGER,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, source)
+);
+CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used);
+"""
+
+# Stored as PRAGMA user_version; a database with another layout is dropped and rebuilt.
+_SCHEMA_VERSION = 2
+
+# Once the table exceeds max_entries it is trimmed to this fraction of it, so the LRU scan
+# runs once per ~10% of max_entries new rows instead of on every put.
+_EVICT_TO = 0.9
+
+
+def default_cache_dir() -> str:
+    """JY_CACHE_DIR, else %LOCALAPPDATA%/jianying-editor (Windows) or ~/.cache/jianying-editor."""
+    if CONFIG.cache_dir:
+        return os.path.abspath(os.path.expanduser(CONFIG.cache_dir))
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "jianying-editor")
+
+
+class ProbeCache:
+    """
+    Cross-process on-disk cache of media probe results (SQLite, WAL mode).
+
+    Entries are keyed by absolute path and `source` ("mediainfo" / "ffprobe") and are only
+    returned while the file's size and mtime_ns still match, so an edited file is re-probed.
+    Several CLI processes may read and write the same database concurrently; each thread uses
+    its own connection. The table is bounded to `max_entries` rows, least recently used first
+    out: the row count is read from the database when the cache is opened and tracked on every
+    put, so the bound holds even for short CLI runs. The cache is best-effort: any SQLite error
+    is treated as a miss.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 20000):
+        self.db_path = os.path.abspath(db_path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._rows: Optional[int] = None
+        self._broken = False
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._broken:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    conn.executescript(
+                        f"DROP TABLE IF EXISTS probes; PRAGMA user_version = {_SCHEMA_VERSION};"
+                    )
+                conn.executescript(_SCHEMA)
+                rows = conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Probe cache disabled ({self.db_path}): {e}")
+                self._broken = True
+                return None
+            self._local.conn = conn
+            with self._lock:
+                if self._rows is None:
+                    self._rows = rows
+        return conn
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def get(self, path: str, source: str = "mediainfo") -> Optional[Dict[str, Any]]:
+        """Return the cached probe record of an unchanged file, or None."""
+        path = os.path.abspath(path)
+        stat = self._stat(path)
+        conn = self._conn()
+        if stat is None or conn is None:
+            return None
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(PROBE_FIELDS)} FROM probes "
+                "WHERE path = ? AND source = ? AND size = ? AND mtime_ns = ?",
+                (path, source, *stat),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE probes SET last_used = ? WHERE path = ? AND source = ?",
+                (time.time(), path, source),
+            )
+        except sqlite3.Error:
+            return None
+        record = dict(zip(PROBE_FIELDS, row))
+        for flag in ("has_video", "has_audio"):
+            if record[flag] is not None:
+                record[flag] = bool(record[flag])
+        return record
+
+    def put(self, path: str, source: str, record: Dict[str, Any]) -> None:
+        """Store a probe record (keys from PROBE_FIELDS, missing ones stored as NULL)."""
+        path = os.path.abspath(path)
+        stat = self._stat(path)
+        conn = self._conn()
+        if stat is None or conn is None:
+            return
+        values = [record.get(name) for name in PROBE_FIELDS]
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO probes (path, size, mtime_ns, source, "
+                f"{', '.join(PROBE_FIELDS)}, last_used) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(PROBE_FIELDS))}, ?)",
+                (path, *stat, source, *values, time.time()),
+            )
+        except sqlite3.Error:
+            return
+
+        # Replacing an existing row also counts, so this may overestimate; evict() re-counts.
+        with self._lock:
+            self._rows = (self._rows or 0) + 1
+            over = self._rows > self.max_entries
+        if over:
+            self.evict(int(self.max_entries * _EVICT_TO))
+
+    def evict(self, keep: Optional[int] = None) -> int:
+        """
+        Drop the least recently used rows beyond `keep` (default `max_entries`); returns the
+        number removed.
+        """
+        conn = self._conn()
+        if conn is None:
+            return 0
+        keep = self.max_entries if keep is None else keep
+        try:
+            cur = conn.execute(
+                "DELETE FROM probes WHERE rowid IN ("
+                "SELECT rowid FROM probes ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (keep,),
+            )
+            rows = conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+        with self._lock:
+            self._rows = rows
+        return cur.rowcount
+
+    def __len__(self) -> int:
+        conn = self._conn()
+        if conn is None:
+            return 0
+        try:
+            return conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def clear(self) -> None:
+        conn = self._conn()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM probes")
+            except sqlite3.Error:
+                pass
+
+
+_DEFAULT_CACHE: Optional[ProbeCache] = None
+
+
+def get_probe_cache() -> Optional[ProbeCache]:
+    """
+    Process-wide cache at <cache_dir>/probe_cache.sqlite; None when disabled
+    (JY_PROBE_CACHE_MAX=0).
+    """
+    global _DEFAULT_CACHE
+    if CONFIG.probe_cache_max <= 0:
+        return None
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = ProbeCache(
+            os.path.join(default_cache_dir(), "probe_cache.sqlite"), CONFIG.probe_cache_max
+        )
+    return _DEFAULT_CACHE
+
+
+def install_probe_cache() -> Optional[ProbeCache]:
+    """Route pyJianYingDraft's VideoMaterial/AudioMaterial probes through the default cache."""
+    from pyJianYingDraft import local_materials
+
+    cache = get_probe_cache()
+    local_materials.set_probe_cache(cache)
+    return cache
@@ -1,10 +1,12 @@
 # ruff: noqa: E402
 
+import json
 import os
+import pickle
 import shutil
 import sys
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 # Bootstrap path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,9 +15,14 @@ scripts_path = os.path.join(skill_root, "scripts")
 if scripts_path not in sys.path:
     sys.path.insert(0, scripts_path)
 
+# 探测缓存、资产索引、转码缓存和守护进程状态都写入测试目录，不碰用户真实的缓存目录；
+# 必须在导入 jy_wrapper 等模块之前设置，它们在导入时读取配置并安装探测缓存
+os.environ["JY_CACHE_DIR"] = os.path.join(current_dir, "output", "cache")
+
 from cloud_manager import CloudManager
 from core.mocking_ops import MockAudioMaterial
 from jy_wrapper import JyProject, draft
+from utils.errors import DataError
 from utils.formatters import safe_tim
 
 
@@ -166,6 +173,907 @@ class TestJyWrapper(unittest.TestCase):
         self.assertEqual(len(p.script.tracks["AudioTrack"].segments), 1)
         self.assertEqual(len(p.script.tracks["AudioTrack_1"].segments), 1)
 
+    def test_12_save_pipeline_single_write(self):
+        """测试保存管线：自定义 pass 生效且返回分段耗时"""
+        p = JyProject("TestSavePipeline", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("Hello", "0s", "3s")
+
+        def tag_pass(content):
+            content["skill_tag"] = "pipeline"
+            return True
+
+        p.register_save_pass("tag", tag_pass)
+        result = p.save()
+
+        self.assertEqual(result["status"], "SUCCESS")
+        for key in (
+            "export",
+            "pass:cloud_material_ids",
+            "pass:activate_adjustments",
+            "pass:tag",
+            "write",
+        ):
+            self.assertIn(key, result["timings_ms"])
+        with open(os.path.join(p.draft_dir, "draft_content.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["skill_tag"], "pipeline")
+
+        # 云音乐补丁 pass 只在确有素材被改写时报告修改
+        content = {"materials": {"audios": [{"path": "/a/voice.mp3", "type": "extract_music"}]}}
+        p._cloud_audio_patches["cloud_music_x.mp3"] = {"id": "x", "type": "music"}
+        self.assertFalse(p._patch_cloud_material_ids(content))
+        content["materials"]["audios"].append(
+            {"path": "cloud_music_x.mp3", "type": "extract_music"}
+        )
+        self.assertTrue(p._patch_cloud_material_ids(content))
+        self.assertEqual(content["materials"]["audios"][1]["music_id"], "x")
+        self.assertFalse(p._patch_cloud_material_ids(content))
+
+    def test_13_adjustment_pass_idempotent(self):
+        """测试调节关键帧的影子素材在多次保存后不会重复累积"""
+        p = JyProject("TestAdjustSave", drafts_root=self.test_output, overwrite=True)
+        seg = p.add_text_simple("Bright", "0s", "3s")
+        seg.add_keyframe(draft.KeyframeProperty.brightness, 0, 0.5)
+
+        p.save()
+        p.save()
+
+        with open(os.path.join(p.draft_dir, "draft_content.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        effects = [m for m in data["materials"]["effects"] if m.get("type") == "brightness"]
+        self.assertEqual(len(effects), 1)
+        self.assertEqual(seg.extra_material_refs.count(effects[0]["id"]), 0)
+
+    def test_14_stream_save_byte_compatible(self):
+        """测试流式写出与一次性 json.dumps 的输出逐字节一致"""
+        p = JyProject("TestStreamSave", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("第一行", "0s", "2s")
+        seg = p.add_text_simple("Second", "2s", "2s", anim_in="Typewriter")
+        seg.add_keyframe(draft.KeyframeProperty.contrast, 0, 0.2)
+        content_path = os.path.join(p.draft_dir, "draft_content.json")
+
+        p.script.dump(content_path, stream=True)
+        with open(content_path, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), p.script.dumps())
+
+        p.save()
+        with open(content_path, "r", encoding="utf-8") as f:
+            eager = json.load(f)
+        # 流式保存时每条轨道的片段只导出一次（调节 pass 读取对象模型，不预先遍历片段 JSON）
+        exported = []
+        iter_json = draft.track.Track.iter_segments_json
+
+        def counting(track):
+            exported.append(track.track_id)
+            return iter_json(track)
+
+        with patch.object(draft.track.Track, "iter_segments_json", counting):
+            p.save(stream=True)
+        self.assertEqual(len(exported), len(p.script.tracks))
+        with open(content_path, "r", encoding="utf-8") as f:
+            streamed = json.load(f)
+        eager_effects = [m["type"] for m in eager["materials"]["effects"]]
+        streamed_effects = [m["type"] for m in streamed["materials"]["effects"]]
+        self.assertEqual(eager_effects, streamed_effects)
+        self.assertEqual(len(streamed["tracks"]), len(eager["tracks"]))
+        self.assertEqual(
+            [len(s["extra_material_refs"]) for t in streamed["tracks"] for s in t["segments"]],
+            [len(s["extra_material_refs"]) for t in eager["tracks"] for s in t["segments"]],
+        )
+
+    def test_15_draft_output_formats(self):
+        """测试 compact/fast 输出格式：内容一致、无缩进空白，非法格式报错"""
+        p = JyProject(
+            "TestDraftFormat", drafts_root=self.test_output, overwrite=True, draft_format="compact"
+        )
+        p.add_text_simple("Compact", "0s", "2s")
+        p.save()
+        content_path = os.path.join(p.draft_dir, "draft_content.json")
+        with open(content_path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        self.assertNotIn("\n", raw)
+        self.assertEqual(json.loads(raw), json.loads(p.script.dumps()))
+        self.assertEqual(json.loads(p.script.dumps("fast")), json.loads(raw))
+
+        with self.assertRaises(ValueError):
+            JyProject("TestBadFormat", drafts_root=self.test_output, draft_format="yaml")
+
+    def test_16_export_cache_dirty_tracking(self):
+        """测试导出缓存：未改动片段复用缓存，修改后只重新导出改动的片段"""
+        p = JyProject("TestExportCache", drafts_root=self.test_output, overwrite=True)
+        first = p.add_text_simple("A", "0s", "1s")
+        second = p.add_text_simple("B", "1s", "1s")
+        p.save()
+        cached_first = first._export_cache
+        cached_second = second._export_cache
+        self.assertIsNotNone(cached_first)
+
+        second.add_keyframe(draft.KeyframeProperty.alpha, 0, 0.5)
+        p.save()
+        self.assertIs(first._export_cache, cached_first)
+        self.assertIsNot(second._export_cache, cached_second)
+
+        # 直接修改嵌套的时间范围也能被指纹检测到
+        first.target_timerange.duration = 500000
+        exported = first.export_json_cached()
+        self.assertEqual(exported["target_timerange"]["duration"], 500000)
+        self.assertEqual(exported, first.export_json())
+
+    def test_17_atomic_save_and_journal_replay(self):
+        """测试原子保存不留临时文件，操作日志可在新工程中重放"""
+        p = JyProject("TestJournal", drafts_root=self.test_output, overwrite=True)
+        journal_path = p.enable_journal(reset=True)
+        style = draft.TextStyle(size=7.0)
+        p.add_text_simple("Line 1", "0s", "1s", style=style)
+        p.add_text_simple("Line 2", duration="2s")
+        p.add_effect_simple("不存在的特效名")  # 失败的操作不会被记录
+        p.save()
+        self.assertEqual(
+            [f for f in os.listdir(p.draft_dir) if f.endswith(".tmp")], [], "no temp file left"
+        )
+
+        # 模拟崩溃时写了一半的日志行
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"v": 1, "op": "add_text_si')
+
+        q = JyProject("TestJournal", drafts_root=self.test_output, overwrite=True)
+        self.assertEqual(q.replay_journal(journal_path), 2)
+        segments = q.script.tracks["Subtitles"].segments
+        self.assertEqual([s.target_timerange.end for s in segments], [1000000, 3000000])
+        self.assertEqual(segments[0].style.size, 7.0)
+
+    def test_18_snapshot_restore(self):
+        """测试会话快照：恢复后草稿内容与补丁表一致，草稿被修改后快照失效"""
+        p = JyProject("TestSnapshot", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("Snap", "0s", "2s")
+        p._cloud_audio_patches["cloud_music_x.mp3"] = {"id": "x", "type": "music"}
+        p.save()
+        snap_path = p.snapshot()
+
+        q = JyProject.restore(snap_path)
+        self.assertEqual(q.script.dumps(), p.script.dumps())
+        self.assertEqual(q._cloud_audio_patches, p._cloud_audio_patches)
+        self.assertIn("activate_adjustments", q._save_pipeline.pass_names)
+        q.add_text_simple("After", duration="1s")
+        self.assertEqual(q.get_track_duration("Subtitles"), 3000000)
+
+        q.save()
+        with self.assertRaises(DataError):
+            JyProject.restore(snap_path)
+
+    def test_19_template_copy_on_write(self):
+        """测试模板模式写时复制：导入片段共享原始数据，修改只体现在导出结果中"""
+        p = JyProject("TestTemplateCow", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("A", "0s", "1s")
+        p.add_text_simple("B", "1s", "1s")
+        p.save()
+        content_path = os.path.join(p.draft_dir, "draft_content.json")
+        with open(content_path, "r", encoding="utf-8") as f:
+            original = json.load(f)
+
+        script = draft.ScriptFile.load_template(content_path)
+        track = script.get_imported_track(draft.TrackType.text, index=0)
+        seg = track.segments[0]
+        self.assertIs(seg.raw_data, script.content["tracks"][0]["segments"][0])
+        self.assertEqual(json.loads(script.dumps()), original)
+
+        seg.start += 100000
+        exported = json.loads(script.dumps())["tracks"][0]["segments"][0]
+        self.assertEqual(exported["target_timerange"]["start"], 100000)
+        self.assertEqual(seg.raw_data["target_timerange"]["start"], 0)
+        # 未修改的嵌套字段直接共享原始数据
+        self.assertIs(seg.export_json()["clip"], seg.raw_data["clip"])
+
+    def test_20_lazy_template_load(self):
+        """测试惰性模板加载：只解析被访问的轨道，替换结果与常规加载一致"""
+        p = JyProject("TestLazyTemplate", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("Title", "0s", "1s", track_name="Titles")
+        p.add_text_simple("Sub", "0s", "1s", track_name="Subs")
+        p.save()
+        content_path = os.path.join(p.draft_dir, "draft_content.json")
+
+        eager = draft.ScriptFile.load_template(content_path)
+        lazy = draft.ScriptFile.load_template(content_path, lazy=True)
+        self.assertEqual(lazy.dumps(), eager.dumps())
+
+        for script in (eager, lazy):
+            track = script.get_imported_track(draft.TrackType.text, name="Subs")
+            script.replace_text(track, 0, "Replaced")
+        self.assertEqual(lazy.dumps(), eager.dumps())
+        parsed = {t.name: t.parsed for t in lazy.imported_tracks}
+        self.assertEqual(parsed, {"Titles": False, "Subs": True})
+
+        sub_id = lazy.get_imported_track(draft.TrackType.text, name="Subs").segments[0].material_id
+        material = lazy.imported_material_index.get(sub_id, "texts")
+        self.assertIn("Replaced", material["content"])
+
+    def test_21_batch_template_replacements(self):
+        """测试批量替换：replace_texts / replace_materials 一次完成，并保持素材索引同步"""
+        p = JyProject("TestBatchReplace", drafts_root=self.test_output, overwrite=True)
+        p.add_text_simple("{name}", "0s", "1s")
+        p.add_text_simple("{city}", "1s", "1s")
+        p.save()
+        content_path = os.path.join(p.draft_dir, "draft_content.json")
+
+        script = draft.ScriptFile.load_template(content_path, lazy=True)
+        count = script.replace_texts({"{name}": "Alice", "{city}": "Paris", "{none}": "x"})
+        self.assertEqual(count, 2)
+        texts = [json.loads(m["content"])["text"] for m in script.imported_materials["texts"]]
+        self.assertEqual(texts, ["Alice", "Paris"])
+
+        script.imported_materials["audios"] = [{"id": "a1", "name": "bgm_old.mp3", "path": "x"}]
+        script.invalidate_material_index()
+        new_audio = MockAudioMaterial("m1", 5000000, "bgm_new.mp3", "/music/bgm_new.mp3")
+        with self.assertRaises(draft.exceptions.MaterialNotFound):
+            script.replace_materials({"bgm_old.mp3": new_audio, "missing.mp3": new_audio})
+        self.assertEqual(script.imported_materials["audios"][0]["path"], "x")
+
+        script.replace_materials({"bgm_old.mp3": new_audio})
+        index = script.imported_material_index
+        self.assertEqual(index.find_by_name("audios", "bgm_old.mp3"), [])
+        self.assertEqual(
+            index.find_by_name("audios", "bgm_new.mp3")[0]["path"], "/music/bgm_new.mp3"
+        )
+        self.assertIs(index.get("a1", "audios"), script.imported_materials["audios"][0])
+
+        # 向新草稿导入一条轨道后按名称替换其素材：导入的素材只登记一次
+        assets = os.path.join(os.path.dirname(current_dir), "assets")
+        v = JyProject("TestImportReplace", drafts_root=self.test_output, overwrite=True)
+        v.add_media_safe(os.path.join(assets, "video.mp4"), "0s", "1s")
+        v.save()
+        source = draft.ScriptFile.load_template(os.path.join(v.draft_dir, "draft_content.json"))
+        target = draft.ScriptFile(1920, 1080, 30, True)
+        target.import_track(source, source.get_imported_track(draft.TrackType.video, index=0))
+        replacement = draft.VideoMaterial(os.path.join(assets, "video.mp4"), "clip.mp4")
+        target.replace_material_by_name("video.mp4", replacement)
+        self.assertEqual(len(target.imported_material_index.find_by_name("videos", "clip.mp4")), 1)
+
+    def test_22_sorted_track_overlap_checks(self):
+        """测试轨道有序插入：乱序添加保持有序，重叠检测只看相邻片段且结果正确"""
+        track = draft.track.Track(draft.TrackType.text, "T", 0, False)
+
+        def seg(start_s, dur_s):
+            return draft.TextSegment("x", draft.trange(f"{start_s}s", f"{dur_s}s"))
+
+        for start in (4, 0, 8, 2):
+            track.add_segment(seg(start, 1))
+        self.assertEqual([s.start for s in track.segments], [0, 2000000, 4000000, 8000000])
+        self.assertEqual(track.end_time, 9000000)
+
+        with self.assertRaises(draft.exceptions.SegmentOverlap):
+            track.add_segment(seg(3.5, 1))
+        self.assertIsNone(track.find_overlap(seg(5, 3)))
+        self.assertIs(track.find_overlap(seg(7, 10)), track.segments[-1])
+
+        # 通过 start 属性移动片段后列表重新排序
+        track.segments[0].start = 10000000
+        self.assertEqual([s.start for s in track.segments], [2000000, 4000000, 8000000, 10000000])
+        self.assertEqual(track.end_time, 11000000)
+
+    def test_23_track_duration_and_timeline_end(self):
+        """测试轨道结束时间：追加、修改时长后即时更新，时间线结束时间包含导入轨道"""
+        p = JyProject("TestTimelineEnd", drafts_root=self.test_output, overwrite=True)
+        for text in ("a", "b", "c"):
+            last = p.add_text_simple(text, duration="1s")
+        self.assertEqual(p.get_track_duration("Subtitles"), 3000000)
+        last.duration = 2500000
+        self.assertEqual(p.get_track_duration("Subtitles"), 4500000)
+        self.assertEqual(p.get_track_duration("Missing"), 0)
+
+        # 结束时间取所有片段的最大值：前面的片段被拉长后超过最后一个片段
+        track = draft.track.Track(draft.TrackType.text, "T", 0, False)
+        a = draft.TextSegment("a", draft.trange("0s", "1s"))
+        b = draft.TextSegment("b", draft.trange("1s", "1s"))
+        track.add_segment(a).add_segment(b)
+        a.duration = 5000000
+        self.assertEqual(track.end_time, 5000000)
+        a.duration = 500000
+        self.assertEqual(track.end_time, 2000000)
+        b.start = 3000000
+        self.assertEqual(track.end_time, 4000000)
+
+        p.add_text_simple("title", "1s", "5s", track_name="Titles")
+        self.assertEqual(p.get_timeline_end(), 6000000)
+        p.save()
+
+        reopened = JyProject("TestTimelineEnd", drafts_root=self.test_output, overwrite=False)
+        self.assertEqual(reopened.get_timeline_end(), 6000000)
+        self.assertFalse(any(t.parsed for t in reopened.script.imported_tracks))
+
+    def test_24_material_registry_id_sets(self):
+        """测试素材注册表：成员检查基于 id 集合，赋值/删除/pickle 后保持同步"""
+        materials = draft.ScriptFile(1920, 1080, 30, True).materials
+        fx = draft.video_segment.VideoEffect(draft.VideoSceneEffectType._90s画质)
+        self.assertNotIn(fx, materials)
+        materials.video_effects.append(fx)
+        self.assertIn(fx, materials)
+
+        materials.video_effects = [fx]
+        self.assertIn(fx, materials)
+        restored = pickle.loads(pickle.dumps(materials))
+        self.assertIn(restored.video_effects[0], restored)
+
+        materials.video_effects.remove(fx)
+        self.assertNotIn(fx, materials)
+
+    def test_25_shared_material_instances(self):
+        """测试素材共享：同一路径的素材只登记一次，裁剪不同则分开登记"""
+        script = draft.ScriptFile(1920, 1080, 30, True)
+        script.add_track(draft.TrackType.audio, "bgm")
+        a = MockAudioMaterial("a1", 3000000, "bgm", "/music/bgm.mp3")
+        b = MockAudioMaterial("a2", 3000000, "bgm", "/music/bgm.mp3")
+        seg_a = draft.AudioSegment(a, draft.trange(0, 1000000))
+        seg_b = draft.AudioSegment(b, draft.trange(1000000, 1000000))
+        self.assertIs(seg_a.material_instance, a)
+        script.add_segment(seg_a, "bgm").add_segment(seg_b, "bgm")
+        self.assertEqual(len(script.materials.audios), 1)
+        self.assertIs(seg_b.material_instance, a)
+        self.assertEqual(seg_b.material_id, "a1")
+
+        def video(material_id, crop):
+            material = draft.VideoMaterial.__new__(draft.VideoMaterial)
+            material.material_id, material.path = material_id, "/clips/a.mp4"
+            material.crop_settings = crop
+            return material
+
+        shared = script.materials.intern(video("v1", draft.CropSettings()))
+        self.assertIs(script.materials.intern(video("v2", draft.CropSettings())), shared)
+        cropped = video("v3", draft.CropSettings(upper_left_x=0.5))
+        self.assertIs(script.materials.intern(cropped), cropped)
+        self.assertEqual(len(script.materials.videos), 2)
+
+    def test_26_material_pool_reuses_probe(self):
+        """测试素材池：同一文件只探测一次，文件变化后重新探测"""
+        p = JyProject("TestMaterialPool", drafts_root=self.test_output, overwrite=True)
+        audio_path = os.path.join(self.test_output, "pool_voice.mp3")
+        with open(audio_path, "wb") as f:
+            f.write(b"\x00" * 16)
+
+        probe = MagicMock(side_effect=lambda path: MockAudioMaterial("pool", 3000000, "v", path))
+        with patch("core.media_ops.draft.AudioMaterial", probe):
+            for i in range(3):
+                p.add_audio_safe(audio_path, start_time=f"{i * 3}s", duration="2s")
+            self.assertEqual(probe.call_count, 1)
+            self.assertEqual(p.material_pool_stats(), {"hits": 2, "misses": 1, "size": 1})
+            self.assertEqual(len(p.script.materials.audios), 1)
+
+            with open(audio_path, "ab") as f:
+                f.write(b"\x00")
+            p.add_audio_safe(audio_path, start_time="9s", duration="2s")
+            self.assertEqual(probe.call_count, 2)
+
+        # 无法探测的视频：兜底时长(duration*10)按每次调用计算，不把首个调用方的值固定进素材池
+        bad_video = os.path.join(self.test_output, "pool_unprobeable.mp4")
+        with open(bad_video, "wb") as f:
+            f.write(b"\x00" * 64)
+        p.add_media_safe(bad_video, start_time="0s", duration="1s", track_name="Bad")
+        seg = p.add_media_safe(bad_video, start_time="1s", duration="20s", track_name="Bad")
+        self.assertEqual(seg.duration, 20000000)
+        self.assertIsNone(p._material_pool.peek("video", bad_video))
+
+        # 有视频轨但解析不出时长(WebM/MKV 常见)：同样不入池，按本次调用的兜底时长
+        from pyJianYingDraft import local_materials
+
+        no_duration = os.path.join(self.test_output, "pool_no_duration.mkv")
+        with open(no_duration, "wb") as f:
+            f.write(b"\x00" * 64)
+        record = {
+            "material_type": "video",
+            "duration": None,
+            "width": 1280,
+            "height": 720,
+            "has_video": True,
+            "has_audio": False,
+            "audio_duration": None,
+        }
+        with patch.object(local_materials, "probe_media", return_value=record):
+            seg = p.add_media_safe(no_duration, "0s", "30s", track_name="NoDuration")
+            self.assertEqual(seg.duration, 30000000)
+            self.assertIsNone(p._material_pool.peek("video", no_duration))
+            seg = p.add_media_safe(no_duration, "30s", "5s", track_name="NoDuration")
+            self.assertEqual(seg.duration, 5000000)
+
+    def test_27_persistent_probe_cache(self):
+        """测试磁盘探测缓存：命中时跳过 MediaInfo，文件变化后失效，超出容量按 LRU 淘汰"""
+        from pyJianYingDraft import local_materials
+        from utils.probe_cache import ProbeCache
+
+        cache = ProbeCache(os.path.join(self.test_output, "probe", "cache.sqlite"), max_entries=2)
+        audio_path = os.path.join(self.test_output, "probe_voice.mp3")
+        with open(audio_path, "wb") as f:
+            f.write(b"\x00" * 16)
+        cache.put(
+            audio_path,
+            "mediainfo",
+            {"has_video": False, "has_audio": True, "audio_duration": 2500000},
+        )
+
+        previous = local_materials._probe_cache
+        local_materials.set_probe_cache(cache)
+        try:
+            with patch.object(local_materials.pymediainfo.MediaInfo, "parse") as parse:
+                material = draft.AudioMaterial(audio_path)
+                parse.assert_not_called()
+        finally:
+            local_materials.set_probe_cache(previous)
+        self.assertEqual(material.duration, 2500000)
+
+        with open(audio_path, "ab") as f:
+            f.write(b"\x00")
+        self.assertIsNone(cache.get(audio_path))
+
+        # 容量上限由 put 自动维持，无需手动调用 evict；行数在打开时从数据库读取，新进程同样生效
+        paths = []
+        for name in ("a", "b", "c"):
+            paths.append(os.path.join(self.test_output, f"probe_{name}.mp4"))
+            with open(paths[-1], "wb") as f:
+                f.write(b"\x00")
+            cache.put(paths[-1], "ffprobe", {"duration": 1000000})
+        self.assertLessEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get(paths[-1], "ffprobe"))
+
+        reopened = ProbeCache(cache.db_path, max_entries=2)
+        reopened.put(audio_path, "mediainfo", {"has_audio": True, "audio_duration": 1})
+        self.assertLessEqual(len(reopened), 2)
+        self.assertIsNotNone(reopened.get(audio_path))
+
+    def test_28_probe_many_and_media_folder(self):
+        """测试批量并行探测：按输入顺序返回、单文件错误不抛异常，文件夹导入复用探测结果"""
+        folder = os.path.join(self.test_output, "batch_audio")
+        os.makedirs(folder, exist_ok=True)
+        for name in ("a.mp3", "b.mp3", "c.mp3", "notes.txt"):
+            with open(os.path.join(folder, name), "wb") as f:
+                f.write(b"\x00" * 8)
+
+        def fake_audio_material(path):
+            if path.endswith("b.mp3"):
+                raise ValueError("broken")
+            return MockAudioMaterial(os.path.basename(path), 3000000, "batch", path)
+
+        p = JyProject("TestProbeMany", drafts_root=self.test_output, overwrite=True)
+        probe = MagicMock(side_effect=fake_audio_material)
+        with patch("core.media_ops.draft.AudioMaterial", probe):
+            paths = [os.path.join(folder, n) for n in ("c.mp3", "a.mp3", "b.mp3")]
+            results = p.probe_many(paths, workers=4)
+            self.assertEqual([r.path for r in results], paths)
+            self.assertEqual([r.ok for r in results], [True, True, False])
+            self.assertIn("broken", results[2].error)
+
+            segments = p.add_media_folder(folder, start_time="0s", clip_duration="1s")
+        self.assertEqual([s.material_instance.path for s in segments], [paths[1], paths[0]])
+        self.assertEqual(segments[1].start, 1000000)
+        # a/c 只探测一次，b 失败后重试一次
+        self.assertEqual(probe.call_count, 4)
+
+    def test_29_ffprobe_json_probe(self):
+        """测试一次性 ffprobe JSON 探测：解析帧率/旋转/音轨数，结果进磁盘缓存只调用一次子进程"""
+        from utils import media_probe
+        from utils.probe_cache import ProbeCache
+
+        output = {
+            "streams": [
+                {
+                    "codec_type": "video",
+                    "codec_name": "h264",
+                    "width": 1920,
+                    "height": 1080,
+                    "pix_fmt": "yuv420p",
+                    "avg_frame_rate": "30000/1001",
+                    "side_data_list": [{"rotation": -90}],
+                },
+                {"codec_type": "audio", "codec_name": "aac"},
+                {"codec_type": "audio", "codec_name": "aac"},
+            ],
+            "format": {"duration": "12.500000"},
+        }
+        clip = os.path.join(self.test_output, "probe_clip.mp4")
+        with open(clip, "wb") as f:
+            f.write(b"\x00" * 8)
+
+        cache = ProbeCache(os.path.join(self.test_output, "ffprobe", "cache.sqlite"))
+        completed = MagicMock(returncode=0, stdout=json.dumps(output), stderr="")
+        with (
+            patch.object(media_probe, "get_probe_cache", return_value=cache),
+            patch.object(media_probe.subprocess, "run", return_value=completed) as run,
+        ):
+            probe = media_probe.probe_media_file(clip)
+            cached = media_probe.probe_media_file(clip)
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(probe, cached)
+        self.assertEqual((probe.duration, probe.fps, probe.rotation), (12.5, 29.97, 90))
+        self.assertEqual(probe.display_size, (1080, 1920))
+        self.assertEqual(
+            (probe.video_codec, probe.pix_fmt, probe.audio_streams), ("h264", "yuv420p", 2)
+        )
+
+        cover = {"codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}}
+        song = media_probe.parse_ffprobe_json("a.mp3", {"streams": [cover, output["streams"][1]]})
+        self.assertFalse(song.has_video)
+        self.assertTrue(song.has_audio)
+
+    def test_30_native_header_parsers(self):
+        """测试容器头快速解析：MP4/WAV/Ogg/MP3 直接读时长，命中时不调用 MediaInfo"""
+        import struct
+        import wave
+
+        from pyJianYingDraft import local_materials
+        from utils.media_headers import read_media_header
+
+        assets = os.path.join(os.path.dirname(current_dir), "assets")
+        video = read_media_header(os.path.join(assets, "video.mp4"))
+        self.assertEqual(
+            (video["duration"], video["width"], video["height"]), (5000000, 2046, 1080)
+        )
+        mp3 = read_media_header(os.path.join(assets, "audio.mp3"))
+        self.assertAlmostEqual(mp3["duration"], 5185000, delta=20000)
+
+        wav_path = os.path.join(self.test_output, "header.wav")
+        with wave.open(wav_path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b"\x00\x00" * 12000)
+        self.assertEqual(read_media_header(wav_path)["duration"], 1500000)
+
+        def ogg_page(granule, packet):
+            header = b"OggS\x00\x00" + struct.pack("<qIII", granule, 7, 0, 0)
+            return header + bytes([1, len(packet)]) + packet
+
+        opus_head = b"OpusHead\x01\x01" + struct.pack("<HIhB", 312, 48000, 0, 0)
+        ogg_path = os.path.join(self.test_output, "header.ogg")
+        with open(ogg_path, "wb") as f:
+            f.write(ogg_page(0, opus_head) + ogg_page(48000 * 3 + 312, b"\x00" * 32))
+        self.assertEqual(read_media_header(ogg_path)["duration"], 3000000)
+
+        previous = local_materials._probe_cache, local_materials._fast_probe
+        local_materials.set_probe_cache(None)
+        local_materials.set_fast_probe(read_media_header)
+        try:
+            with patch.object(local_materials.pymediainfo.MediaInfo, "parse") as parse:
+                self.assertEqual(draft.AudioMaterial(ogg_path).duration, 3000000)
+                parse.assert_not_called()
+        finally:
+            local_materials.set_probe_cache(previous[0])
+            local_materials.set_fast_probe(previous[1])
+
+    def test_31_background_webm_normalization(self):
+        """测试 WEBM 后台转码：添加时立即返回占位片段，save() 等待转码并换成 MP4 路径"""
+        import threading
+
+        from utils.media_probe import MediaProbe
+
+        webm = os.path.join(self.test_output, "anim.webm")
+        with open(webm, "wb") as f:
+            f.write(b"\x00" * 64)
+        mp4 = os.path.join(self.test_output, "anim.__jy_norm__.mp4")
+        release = threading.Event()
+
+        def slow_normalize(src, timeout=None):
+            release.wait(5)
+            with open(mp4, "wb") as f:
+                f.write(b"\x00")
+            return mp4
+
+        probe = MediaProbe(webm, duration=4.0, width=640, height=360, video_codec="vp9")
+        p = JyProject("TestWebmPool", drafts_root=self.test_output, overwrite=True)
+        with (
+            patch("core.media_ops.probe_media_file", return_value=probe),
+            patch("utils.media_normalizer.normalize_webm_for_jianying", side_effect=slow_normalize),
+        ):
+            seg = p.add_media_safe(webm, start_time="0s")
+            self.assertIsNotNone(seg)
+            self.assertEqual(seg.duration, 4000000)
+            self.assertEqual(seg.material_instance.path, os.path.abspath(webm))
+            self.assertEqual(p._normalization_pool.pending, 1)
+            # 转码完成前再次添加同一 WEBM：共享同一素材，只等待一次
+            again = p.add_media_safe(webm, start_time="4s")
+            self.assertIs(again.material_instance, seg.material_instance)
+            self.assertEqual(len(p._pending_normalizations), 1)
+
+            release.set()
+            self.assertEqual(p.wait_normalizations(), {os.path.abspath(webm): mp4})
+            p.save()
+        self.assertEqual(seg.material_instance.path, mp4)
+
+        # 转码结果已缓存后再添加该 WEBM（走 MP4 路径）仍复用同一素材
+        with patch("core.media_ops.fresh_normalized_path", return_value=mp4):
+            third = p.add_media_safe(webm, start_time="8s")
+        self.assertIs(third.material_instance, seg.material_instance)
+        self.assertEqual(len(p.script.materials.videos), 1)
+
+        with open(
+            os.path.join(self.test_output, "TestWebmPool", "draft_content.json"), encoding="utf-8"
+        ) as f:
+            self.assertEqual(json.load(f)["materials"]["videos"][0]["path"], mp4)
+
+    def test_32_remux_and_content_hash_cache(self):
+        """测试转码缓存：兼容编码走 -c copy，不同目录的相同内容只处理一次并计入统计"""
+        from utils import media_normalizer
+        from utils.media_probe import MediaProbe
+
+        cache = media_normalizer.NormalizationCache(
+            os.path.join(self.test_output, "norm_cache"), max_bytes=1 << 20
+        )
+        sources = []
+        for folder in ("rec_a", "rec_b"):
+            os.makedirs(os.path.join(self.test_output, folder), exist_ok=True)
+            sources.append(os.path.join(self.test_output, folder, "clip.webm"))
+            with open(sources[-1], "wb") as f:
+                f.write(b"same-content")
+
+        def fake_ffmpeg(cmd, **kwargs):
+            with open(cmd[-1], "wb") as f:
+                f.write(b"\x00" * 100)
+            return MagicMock(returncode=0, stdout="", stderr="")
+
+        probe = MediaProbe(
+            sources[0], 2.0, 1280, 720, 30.0, "h264", "opus", "yuv420p", 0, audio_streams=1
+        )
+        with (
+            patch.object(media_normalizer, "get_normalization_cache", return_value=cache),
+            patch.object(media_normalizer, "probe_media_file", return_value=probe),
+            patch.object(media_normalizer.subprocess, "run", side_effect=fake_ffmpeg) as run,
+        ):
+            first = media_normalizer.normalize_webm_for_jianying(sources[0])
+            second = media_normalizer.normalize_webm_for_jianying(sources[1])
+        self.assertEqual(first, media_normalizer.draft_output_path(sources[0]))
+        self.assertEqual(second, media_normalizer.draft_output_path(sources[1]))
+        self.assertTrue(os.path.samefile(first, second))  # 同一文件系统上为同一输出的硬链接
+        self.assertEqual(run.call_count, 1)
+        cmd = run.call_args[0][0]
+        self.assertIn("copy", cmd[cmd.index("-c:v") + 1])
+        self.assertEqual(cmd[cmd.index("-c:a") + 1], "aac")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["remuxes"], stats["transcodes"]), (1, 1, 0))
+        self.assertEqual((stats["transcodes_avoided"], stats["bytes_saved"]), (2, 100))
+
+        # 淘汰只删除缓存中的文件，草稿引用的目录内副本保留
+        cache.max_bytes = 0
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertTrue(os.path.exists(first) and os.path.exists(second))
+
+    def test_33_persistent_asset_index(self):
+        """测试资产倒排索引：结果与逐行扫描评分一致，索引落盘复用，CSV 修改后自动重建"""
+        import asset_search
+        from utils import asset_index
+
+        data_dir = os.path.join(self.test_output, "asset_data")
+        os.makedirs(data_dir, exist_ok=True)
+        csv_path = os.path.join(data_dir, "filters.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("# comment\nidentifier,category,description\n")
+            f.write("复古胶片,Filters,Free\n冷蓝,Filters,Free\n复古,Filters,vintage look\n")
+        index_path = os.path.join(self.test_output, "asset_index.pickle")
+
+        with (
+            patch.object(asset_search, "DATA_DIR", data_dir),
+            patch.object(asset_index, "default_index_path", return_value=index_path),
+        ):
+            results = asset_search.search_assets("复古 vintage", ranking="legacy")
+            self.assertEqual([r["identifier"] for r in results], ["复古", "复古胶片"])
+            self.assertEqual([r["score"] for r in results], [120, 10])
+            self.assertEqual(results[0]["source_file"], "filters.csv")
+            self.assertTrue(os.path.exists(index_path))
+
+            signature = asset_index.catalog_signature(data_dir)
+            self.assertEqual(len(asset_index.AssetIndex.load(index_path, signature)), 3)
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("复古港风,Filters,Free\n")
+            os.utime(csv_path, ns=(0, os.stat(csv_path).st_mtime_ns + 10**9))
+            results = asset_search.search_assets("复古", limit=10, ranking="legacy")
+            self.assertEqual(len(results), 3)
+            self.assertIsNone(asset_index.AssetIndex.load(index_path, signature))
+
+    def test_34_bm25_asset_ranking(self):
+        """测试 BM25 排序：中文按二元组切分、Latin 按词切分，完整命中排第一，无词项时回退子串匹配"""
+        import asset_search
+        from utils import asset_index
+        from utils.errors import UserInputError
+
+        self.assertEqual(asset_index.tokenize("_90s画质"), ["90s", "画质"])
+        self.assertEqual(asset_index.tokenize("复古打字机"), ["复古", "古打", "打字", "字机"])
+        self.assertEqual(asset_index.tokenize("雾"), ["雾"])
+
+        data_dir = os.path.join(self.test_output, "rank_data")
+        os.makedirs(data_dir, exist_ok=True)
+        with open(os.path.join(data_dir, "text_animations.csv"), "w", encoding="utf-8") as f:
+            f.write("identifier,category,enum_type,description\n")
+            for ident in ("打字机_I", "故障打字机", "复古打字机", "复古放映", "雾化", "+_+"):
+                f.write(f"{ident},Text Animations,TextIntro,Free\n")
+
+        with (
+            patch.object(asset_search, "DATA_DIR", data_dir),
+            patch.object(
+                asset_index,
+                "default_index_path",
+                return_value=os.path.join(self.test_output, "rank_index.pickle"),
+            ),
+        ):
+            results = asset_search.search_assets("复古打字机效果", limit=3)
+            self.assertEqual(len(results), 3)
+            self.assertEqual(results[0]["identifier"], "复古打字机")
+            self.assertGreater(results[0]["score"], results[1]["score"])
+            self.assertEqual(asset_search.search_assets("雾")[0]["identifier"], "雾化")
+            # 没有可切分的词项时回退到旧的子串匹配
+            self.assertEqual(asset_search.search_assets("+_+")[0]["score"], 110)
+            with self.assertRaises(UserInputError):
+                asset_search.search_assets("复古", ranking="tfidf")
+
+    def test_35_sqlite_asset_catalog(self):
+        """测试 SQLite 资产目录：按内容哈希增量重建，FTS5 检索，CloudManager 可直接查询"""
+        from utils.asset_catalog import AssetCatalog
+
+        data_dir = os.path.join(self.test_output, "catalog_data")
+        os.makedirs(data_dir, exist_ok=True)
+        music_csv = os.path.join(data_dir, "cloud_music_library.csv")
+        filters_csv = os.path.join(data_dir, "filters.csv")
+        with open(music_csv, "w", encoding="utf-8") as f:
+            f.write("# Schema: identifier,title,duration_s,categories\n")
+            f.write("music_id,title,duration_s,categories,url\n")
+            f.write("101,Tropical House,143.53,VLOG,https://example.com/a.m4a\n")
+            f.write("102,好心情,157.53,VLOG,\n")
+        with open(filters_csv, "w", encoding="utf-8") as f:
+            f.write("identifier,category,enum_type,description\n复古胶片,Filters,FilterType,Free\n")
+
+        catalog = AssetCatalog(data_dir, os.path.join(self.test_output, "catalog.sqlite"))
+        self.assertEqual(set(catalog.sync().values()), {"built"})
+
+        st = os.stat(filters_csv)
+        os.utime(filters_csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with open(music_csv, "a", encoding="utf-8") as f:
+            f.write("103,Tropical Rain,60,VLOG,https://example.com/b.m4a\n")
+        report = catalog.sync()
+        self.assertEqual(report, {"cloud_music_library.csv": "built", "filters.csv": "unchanged"})
+
+        matches = catalog.search_fts(["复古", "胶片"], ["filters.csv"], 5)
+        self.assertEqual(matches[0][2]["identifier"], "复古胶片")
+        self.assertEqual(matches[0][1], "filters.csv")
+
+        cm = CloudManager(catalog=catalog)
+        self.assertEqual(cm.find_asset("103")["name"], "Tropical Rain")
+        self.assertEqual(cm.find_asset("tropical")["id"], "101")
+        self.assertIsNone(cm.find_asset("102"))  # 没有 URL 的条目视为不可用
+        self.assertEqual(cm.get_asset_duration("101"), 143.53)
+
+        os.remove(filters_csv)
+        self.assertEqual(catalog.sync()["filters.csv"], "removed")
+        self.assertEqual(catalog.stats()["rows"], 3)
+
+    def test_36_asset_search_batch(self):
+        """测试批量检索：JSONL 输入，结果按输入顺序输出 make_result 信封并带耗时，坏行单独报错"""
+        import asset_search
+        from utils import asset_index
+
+        data_dir = os.path.join(self.test_output, "batch_data")
+        os.makedirs(data_dir, exist_ok=True)
+        for name, idents in (("filters", ("复古胶片", "冷蓝")), ("transitions", ("雾化", "叠化"))):
+            with open(os.path.join(data_dir, f"{name}.csv"), "w", encoding="utf-8") as f:
+                f.write("identifier,category,enum_type,description\n")
+                f.writelines(f"{ident},{name},T,Free\n" for ident in idents)
+
+        lines = [
+            json.dumps({"id": "a", "query": "雾化", "category": "transitions"}),
+            "not json",
+            json.dumps({"id": "b", "query": "复古", "category": "filters", "limit": 1}),
+            json.dumps("叠化"),
+            json.dumps({"query": "冷蓝", "limit": "2"}),
+            json.dumps({"query": "复古", "category": 5}),
+            json.dumps({"id": [1], "query": "复古"}),
+        ]
+        with (
+            patch.object(asset_search, "DATA_DIR", data_dir),
+            patch.object(
+                asset_index,
+                "default_index_path",
+                return_value=os.path.join(self.test_output, "batch_index.pickle"),
+            ),
+        ):
+            out = list(asset_search.run_batch(lines, backend="index", workers=3))
+
+        self.assertEqual([r["ok"] for r in out], [True, False, True, True, False, False, False])
+        self.assertEqual(out[0]["data"]["id"], "a")
+        self.assertEqual(out[0]["data"]["results"][0]["identifier"], "雾化")
+        self.assertEqual(out[1]["data"], {"line": 2})
+        self.assertEqual(out[2]["data"]["count"], 1)
+        self.assertEqual(out[3]["data"]["results"][0]["source_file"], "transitions.csv")
+        self.assertGreaterEqual(out[0]["data"]["elapsed_ms"], 0)
+        self.assertEqual(out[4]["code"], "invalid_input")
+        self.assertEqual([r["data"] for r in out[5:]], [{"line": 6}, {"line": 7}])
+
+        # 单条查询抛出意外异常时只有该行报错，其余行照常输出
+        real_search = asset_search.search_assets
+
+        def flaky(query, *args, **kwargs):
+            if query == "boom":
+                raise KeyError("boom")
+            return real_search(query, *args, **kwargs)
+
+        with (
+            patch.object(asset_search, "DATA_DIR", data_dir),
+            patch.object(
+                asset_index,
+                "default_index_path",
+                return_value=os.path.join(self.test_output, "batch_index.pickle"),
+            ),
+            patch.object(asset_search, "search_assets", side_effect=flaky),
+        ):
+            out = list(asset_search.run_batch(['"boom"', '"雾化"'], backend="index"))
+        self.assertEqual([r["code"] for r in out], ["internal_error", "ok"])
+
+    def test_37_resident_daemon(self):
+        """测试常驻守护进程：Unix 套接字与 TCP 两种传输上的 JSON-RPC，未运行时 try_daemon 回退本地"""
+        import socketserver
+        import tempfile
+        import threading
+
+        import jy_daemon
+        from utils import daemon_client
+
+        modes = [True] if not hasattr(socketserver, "UnixStreamServer") else [False, True]
+        for tcp in modes:
+            with self.subTest(tcp=tcp):
+                state_path = os.path.join(self.test_output, "daemon", "state.json")
+                sock_dir = tempfile.mkdtemp(prefix="jyd")  # AF_UNIX 路径长度有限，使用短路径
+                daemon = jy_daemon.JyDaemon(state_path, os.path.join(sock_dir, "d.sock"), tcp=tcp)
+                state = daemon.bind()
+                self.assertEqual(state["transport"], "tcp" if tcp else "unix")
+                thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+                thread.start()
+                try:
+                    client = daemon_client.DaemonClient(daemon_client.read_state(state_path))
+                    self.assertEqual(client.call("ping")["pid"], os.getpid())
+                    found = client.call("search", query="叠化", category="transitions", limit=3)
+                    self.assertEqual(found[0]["identifier"], "叠化")
+                    resolved = client.call("resolve", enum="TransitionType", name="叠化")
+                    self.assertEqual(resolved["key"], "叠化")
+                    with self.assertRaises(daemon_client.DaemonError) as ctx:
+                        client.call("no_such_method")
+                    self.assertEqual(ctx.exception.code, -32601)
+                    with self.assertRaises(daemon_client.DaemonError) as ctx:
+                        client.call("search", bogus=1)
+                    self.assertEqual(ctx.exception.code, -32602)
+                    if tcp:
+                        forged = daemon_client.DaemonClient(dict(state, token="wrong"))
+                        with self.assertRaises(daemon_client.DaemonError) as ctx:
+                            forged.call("ping")
+                        self.assertEqual(ctx.exception.code, -32001)
+                finally:
+                    daemon.shutdown()
+                    thread.join(5)
+                    shutil.rmtree(sock_dir, ignore_errors=True)
+
+                self.assertFalse(thread.is_alive())
+                self.assertFalse(os.path.exists(state_path))
+                if state["transport"] == "unix":
+                    self.assertFalse(os.path.exists(state["path"]))
+                with patch.object(daemon_client, "default_state_path", return_value=state_path):
+                    self.assertEqual(daemon_client.try_daemon("ping"), (False, None))
+
+        # 常驻进程中的 CloudManager 在目录 CSV 变化后重建，新增的素材无需重启守护进程即可找到
+        import cloud_manager
+
+        skill_root = os.path.join(self.test_output, "daemon_skill")
+        data_dir = os.path.join(skill_root, "data")
+        os.makedirs(data_dir, exist_ok=True)
+        music_csv = os.path.join(data_dir, "cloud_music_library.csv")
+        with open(music_csv, "w", encoding="utf-8") as f:
+            f.write("music_id,title,duration_s,categories,url\n")
+            f.write("101,Old Song,60,VLOG,https://example.com/a.m4a\n")
+        daemon = jy_daemon.JyDaemon(state_path)
+        with (
+            patch.object(cloud_manager, "SKILL_ROOT", skill_root),
+            patch.object(jy_daemon.asset_search, "DATA_DIR", data_dir),
+        ):
+            self.assertIsNone(daemon.rpc_find_asset("202", backend="index"))
+            with open(music_csv, "a", encoding="utf-8") as f:
+                f.write("202,New Song,30,VLOG,https://example.com/b.m4a\n")
+            st = os.stat(music_csv)
+            os.utime(music_csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+            self.assertEqual(daemon.rpc_find_asset("202", backend="index")["name"], "New Song")
+
     @classmethod
     def tearDownClass(cls):
         # 清理测试产物
@@ -0,0 +1,119 @@
+"""
+Benchmark asset_search ranking (relevance and latency) over the shipped data/*.csv.
+
+Relevance is measured on two query sets:
+- curated: reworded / split queries with one expected identifier each;
+- known-item: every effect/animation/filter/transition identifier queried verbatim
+  (leading underscores stripped), expecting that row.
+For each ranking mode the mean reciprocal rank (MRR), hit@1 and hit@K are reported, plus
+the per-query latency against a warm in-process index.
+
+Usage:
+    python tools/bench_asset_search.py --k 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "vendor"))
+
+import asset_search  # noqa: E402
+from utils.asset_index import iter_catalog_rows  # noqa: E402
+
+# (query, category, expected identifier)
+CURATED = [
+    ("复古 打字机", "text_animations", "复古打字机"),
+    ("打字机 故障", "text_animations", "故障打字机"),
+    ("90s 画质", None, "_90s画质"),
+    ("ins 放大镜", None, "ins风放大镜"),
+    ("windows 弹窗 打开", None, "windows弹窗打开"),
+    ("丁达尔", None, "丁达尔光线"),
+    ("漏光 复古", "transitions", "复古漏光"),
+    ("love you", "video_scene_effects", "I_Love_You"),
+    ("故障 雪花", "transitions", "雪花故障"),
+    ("dissolve", "transitions", "叠化"),
+    ("放大 动感", "video_intro_animations", "动感放大"),
+    ("融化 冰雪", "video_outro_animations", "冰雪融化"),
+    ("复古打字机效果", "text_animations", "复古打字机"),
+    ("雪花故障转场", "transitions", "雪花故障"),
+    ("i love you 特效", "video_scene_effects", "I_Love_You"),
+    ("动感放大入场", "video_intro_animations", "动感放大"),
+    ("windows弹窗打开特效", None, "windows弹窗打开"),
+    ("丁达尔光线效果", None, "丁达尔光线"),
+]
+
+KNOWN_ITEM_FILES = (
+    "filters.csv",
+    "transitions.csv",
+    "text_animations.csv",
+    "video_intro_animations.csv",
+    "video_outro_animations.csv",
+    "video_scene_effects.csv",
+)
+
+
+def known_item_queries():
+    queries = []
+    for filename in KNOWN_ITEM_FILES:
+        category = filename[:-4]
+        for row in iter_catalog_rows(os.path.join(asset_search.DATA_DIR, filename)):
+            ident = row.get("identifier") or ""
+            if ident.strip("_"):
+                queries.append((ident.strip("_").replace("_", " "), category, ident))
+    return queries
+
+
+def evaluate(queries, ranking: str, k: int):
+    reciprocal = hit1 = hitk = 0.0
+    elapsed = 0.0
+    for query, category, expected in queries:
+        t0 = time.perf_counter()
+        results = asset_search.search_assets(query, category, k, ranking)
+        elapsed += time.perf_counter() - t0
+        idents = [r.get("identifier") for r in results]
+        if expected in idents:
+            rank = idents.index(expected) + 1
+            reciprocal += 1.0 / rank
+            hit1 += rank == 1
+            hitk += 1
+    n = len(queries) or 1
+    return {
+        "queries": len(queries),
+        "mrr": round(reciprocal / n, 3),
+        "hit@1": round(hit1 / n, 3),
+        f"hit@{k}": round(hitk / n, 3),
+        "avg_ms": round(elapsed * 1000 / n, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark asset_search ranking")
+    parser.add_argument("--k", type=int, default=10, help="result limit per query")
+    parser.add_argument("--json", action="store_true", help="print result as JSON")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    asset_search.search_assets("warmup")
+    warm_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    report = {"index_load_ms": warm_ms, "k": args.k}
+    for name, queries in (("curated", CURATED), ("known_item", known_item_queries())):
+        report[name] = {r: evaluate(queries, r, args.k) for r in asset_search.RANKINGS}
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
+    print(f"index_load_ms={warm_ms} k={args.k}")
+    for name in ("curated", "known_item"):
+        for ranking, stats in report[name].items():
+            print(f"{name:<10} {ranking:<6} " + " ".join(f"{k}={v}" for k, v in stats.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
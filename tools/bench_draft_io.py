@@ -0,0 +1,96 @@
+"""
+Benchmark draft serialization profiles (pretty / compact / fast).
+
+Builds a synthetic draft with N text segments (each with a keyframe) and reports
+encode time and output size for every output format, eager and streaming.
+
+Usage:
+    python tools/bench_draft_io.py --segments 5000 --repeat 3
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "vendor"))
+
+import pyJianYingDraft as draft  # noqa: E402
+from pyJianYingDraft import json_stream  # noqa: E402
+
+
+def build_script(segments: int) -> draft.ScriptFile:
+    script = draft.ScriptFile(1920, 1080, 30, True)
+    script.add_track(draft.TrackType.text, "bench_text")
+    for i in range(segments):
+        seg = draft.TextSegment(
+            f"字幕 {i}", draft.trange(i * 1_000_000, 900_000), style=draft.TextStyle(size=6.0)
+        )
+        seg.add_keyframe(draft.KeyframeProperty.alpha, 0, 1.0)
+        script.add_segment(seg, "bench_text")
+    return script
+
+
+def bench(script: draft.ScriptFile, repeat: int) -> List[Dict[str, object]]:
+    rows = []
+    for output_format in json_stream.OUTPUT_FORMATS:
+        for stream in (False, True):
+            best = float("inf")
+            size = 0
+            for _ in range(repeat):
+                buf = io.StringIO()
+                t0 = time.perf_counter()
+                json_stream.write(script.export_content(lazy=stream), buf, output_format, stream)
+                best = min(best, time.perf_counter() - t0)
+                size = len(buf.getvalue().encode("utf-8"))
+            rows.append(
+                {
+                    "format": output_format,
+                    "stream": stream,
+                    "encode_ms": round(best * 1000, 1),
+                    "size_kb": round(size / 1024, 1),
+                }
+            )
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark draft serialization profiles")
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    script = build_script(args.segments)
+    build_ms = round((time.perf_counter() - t0) * 1000, 1)
+    rows = bench(script, max(1, args.repeat))
+    if args.json:
+        print(
+            json.dumps(
+                {"fast_backend": json_stream.fast_backend(), "build_ms": build_ms, "rows": rows},
+                indent=2,
+            )
+        )
+        return 0
+
+    print(
+        f"segments={args.segments} build_ms={build_ms} "
+        f"fast_backend={json_stream.fast_backend() or 'stdlib'}"
+    )
+    print(f"{'format':<8} {'stream':<7} {'encode_ms':>10} {'size_kb':>10}")
+    for row in rows:
+        print(
+            f"{row['format']:<8} {str(row['stream']):<7} "
+            f"{row['encode_ms']:>10} {row['size_kb']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
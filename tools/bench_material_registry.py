@@ -0,0 +1,76 @@
+"""
+Benchmark material registration in ScriptFile.add_segment.
+
+Adds N video segments that each carry an intro animation, a scene effect, a
+filter and a transition, so every add_segment performs several material
+membership checks (`material in script.materials`).
+
+Usage:
+    python tools/bench_material_registry.py --segments 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "vendor"))
+
+import pyJianYingDraft as draft  # noqa: E402
+
+
+def fake_video_material() -> draft.VideoMaterial:
+    # Skip the pymediainfo probe: only the attributes VideoSegment reads are needed.
+    material = draft.VideoMaterial.__new__(draft.VideoMaterial)
+    material.material_id = "bench_material"
+    material.local_material_id = ""
+    material.material_name = material.path = "bench.mp4"
+    material.duration = 3_600_000_000
+    material.width, material.height = 1920, 1080
+    material.crop_settings = draft.CropSettings()
+    material.material_type = "video"
+    return material
+
+
+def build_script(segments: int) -> draft.ScriptFile:
+    script = draft.ScriptFile(1920, 1080, 30, True)
+    script.add_track(draft.TrackType.video, "bench_video")
+    material = fake_video_material()
+    for i in range(segments):
+        seg = draft.VideoSegment(material, draft.trange(i * 1_000_000, 1_000_000))
+        seg.add_animation(draft.IntroType.动感放大)
+        seg.add_effect(draft.VideoSceneEffectType._90s画质)
+        seg.add_filter(draft.FilterType.ABG)
+        seg.add_transition(draft.TransitionType.上移)
+        script.add_segment(seg, "bench_video")
+    return script
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark material registration")
+    parser.add_argument("--segments", type=int, default=50000)
+    parser.add_argument("--json", action="store_true", help="print result as JSON")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    script = build_script(args.segments)
+    build_ms = round((time.perf_counter() - t0) * 1000, 1)
+    counts = {
+        "video_effects": len(script.materials.video_effects),
+        "filters": len(script.materials.filters),
+        "transitions": len(script.materials.transitions),
+        "animations": len(script.materials.animations),
+    }
+    if args.json:
+        print(json.dumps({"segments": args.segments, "build_ms": build_ms, "materials": counts}))
+        return 0
+    print(f"segments={args.segments} build_ms={build_ms}")
+    print(" ".join(f"{k}={v}" for k, v in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
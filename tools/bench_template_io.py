@@ -0,0 +1,111 @@
+"""
+Benchmark template-mode load/save (ScriptFile.load_template -> save).
+
+Writes a synthetic template with N text segments spread over T text tracks, then
+measures the time and the tracemalloc peak of loading it, re-saving it unchanged and
+re-saving it after replacing one subtitle, with eager and lazy (`lazy=True`) loading.
+
+Usage:
+    python tools/bench_template_io.py --segments 5000 --tracks 10 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "vendor"))
+
+import pyJianYingDraft as draft  # noqa: E402
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    # tracemalloc slows allocation down considerably, so the peak is taken in a separate run
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms": round(best * 1000, 1), "peak_mb": round(peak / 1024 / 1024, 2)}
+
+
+def build_template(segments: int, tracks: int) -> draft.ScriptFile:
+    script = draft.ScriptFile(1920, 1080, 30, True)
+    per_track = max(1, segments // tracks)
+    for t in range(tracks):
+        name = f"bench_text_{t}"
+        script.add_track(draft.TrackType.text, name, relative_index=t)
+        for i in range(per_track):
+            seg = draft.TextSegment(
+                f"字幕 {t}-{i}",
+                draft.trange(i * 1_000_000, 900_000),
+                style=draft.TextStyle(size=6.0),
+            )
+            seg.add_keyframe(draft.KeyframeProperty.alpha, 0, 1.0)
+            script.add_segment(seg, name)
+    return script
+
+
+def bench(template_path: str, repeat: int) -> List[Dict[str, object]]:
+    rows = []
+    for lazy in (False, True):
+
+        def load():
+            return draft.ScriptFile.load_template(template_path, lazy=lazy)
+
+        def load_save():
+            load().dump(template_path + ".out.json")
+
+        def load_edit_save():
+            script = load()
+            track = script.get_imported_track(draft.TrackType.text, index=0)
+            script.replace_text(track, 0, "替换后的字幕")
+            script.dump(template_path + ".out.json")
+
+        for name, fn in (
+            ("load", load),
+            ("load+save", load_save),
+            ("load+edit+save", load_edit_save),
+        ):
+            rows.append({"case": name, "lazy": lazy, **measure(fn, repeat)})
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark template-mode load/save")
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "draft_content.json")
+        build_template(args.segments, max(1, args.tracks)).dump(template_path)
+        size_kb = round(os.path.getsize(template_path) / 1024, 1)
+        rows = bench(template_path, max(1, args.repeat))
+
+    if args.json:
+        print(json.dumps({"segments": args.segments, "size_kb": size_kb, "rows": rows}, indent=2))
+        return 0
+
+    print(f"segments={args.segments} tracks={args.tracks} template_kb={size_kb}")
+    print(f"{'case':<16} {'lazy':<6} {'ms':>10} {'peak_mb':>10}")
+    for row in rows:
+        print(f"{row['case']:<16} {str(row['lazy']):<6} {row['ms']:>10} {row['peak_mb']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())